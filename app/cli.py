@@ -0,0 +1,229 @@
+"""
+Maintenance commands
+
+Usage:
+    python -m app.cli migrate
+    python -m app.cli backfill-rollups
+    python -m app.cli check-casino-stats [--fix]
+    python -m app.cli simulate [--machine 1] [--bet 100] [--spins 100000000]
+    python -m app.cli compress-static
+    python -m app.cli archive-spins [--days 90]
+    python -m app.cli recompute-progress
+    python -m app.cli seed [--users 100000] [--sessions 10000000] [--spins 20000000] [--seed 0]
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from .db import crud, migrations
+
+
+def migrate(args):
+    """Applies pending schema migrations"""
+    from .db.database import engine
+
+    applied = migrations.migrate(engine)
+    for m in applied:
+        print(f"applied {m.version:04d} {m.name}")
+    print(f"schema version: {migrations.current_version(engine)}")
+
+
+def backfill_rollups(args):
+    """Rebuilds study_daily_rollups from study_sessions"""
+    from .db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rows = crud.backfill_study_rollups(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"study_daily_rollups: {rows} rows")
+
+
+def check_casino_stats(args):
+    """Verifies casino_user_stats against casino_spins, rebuilds with --fix"""
+    from .db.database import SessionLocal
+
+    today = datetime.utcnow().date()
+    db = SessionLocal()
+    try:
+        drifted = crud.check_casino_stats(db, today)
+        print(f"casino_user_stats: {len(drifted)} users out of sync")
+        if drifted and args.fix:
+            rows = crud.rebuild_casino_stats(db, today)
+            db.commit()
+            print(f"casino_user_stats: rebuilt {rows} rows")
+    finally:
+        db.close()
+
+    if drifted and not args.fix:
+        raise SystemExit(1)
+
+
+def simulate(args):
+    """Monte Carlo RTP / variance / ruin report for slot machines"""
+    from .services import simulator
+    from .services.slots import MACHINES
+
+    machine_ids = [args.machine] if args.machine else sorted(MACHINES)
+    report = {}
+    for machine_id in machine_ids:
+        machine = MACHINES[machine_id]
+        report[machine_id] = {
+            "name": machine.name,
+            "bet": args.bet,
+            "exact": simulator.exact_stats(machine, args.bet),
+            "simulated": simulator.simulate(machine, args.bet, args.spins, seed=args.seed, workers=args.workers),
+            "ruin": {
+                balance: simulator.ruin_curve(machine, args.bet, balance, players=args.players, seed=args.seed)
+                for balance in simulator.RUIN_BALANCES
+            },
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for machine_id, entry in report.items():
+        exact, sim = entry["exact"], entry["simulated"]
+        print(f"machine {machine_id} ({entry['name']}), bet {entry['bet']}, {sim['spins']:,} spins")
+        print(f"  {'':14}{'simulated':>12}{'exact':>12}")
+        for key in ("rtp", "variance", "jackpot_rate", "double_rate"):
+            print(f"  {key:14}{sim[key]:12.6f}{exact[key]:12.6f}")
+        print("  ruin probability within k spins (start balance -> k):")
+        for balance, curve in entry["ruin"].items():
+            print(f"    {balance:>6}: " + "  ".join(f"{k}:{p:.3f}" for k, p in curve.items()))
+
+
+def compress_static(args):
+    """Writes .br / .gz next to the built SPA files (run after `npm run build`)"""
+    from config import properties
+    from .services.static import available_encodings, compress_directory
+
+    directory = args.directory or properties["path"]["frontend"] / "dist"
+    written = compress_directory(directory, min_size=properties["static"]["min_compress_bytes"])
+    print(f"{directory}: {written} files written ({', '.join(available_encodings())})")
+
+
+def archive_spins(args):
+    """Moves spins older than the window to monthly archive tables"""
+    from config import properties
+    from .db import archive
+    from .db.database import engine
+
+    days = args.days or properties["casino"]["archive_after_days"]
+    result = archive.archive_spins(engine, days, log=print)
+    print(f"archived {result['spins']:,} spins from {result['days']} day(s) before {result['before']}")
+
+
+def recompute_progress(args):
+    """Rebuilds users' study totals, streaks and last study dates from study_sessions"""
+    from .db import recompute
+    from .db.database import engine
+
+    result = recompute.recompute_progress(engine, log=print)
+    print(f"{result['users']:,} users with sessions, {result['updated']:,} updated, "
+          f"{result['zeroed']:,} zeroed in {result['seconds']}s")
+
+
+def _weights(value):
+    from .db.seed import parse_weights
+
+    try:
+        return parse_weights(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected key:weight,... got {value!r}")
+
+
+def seed(args):
+    """Fills an empty database with synthetic users, study sessions and spins"""
+    from .db import seed as seeding
+    from .db.database import engine
+
+    dist = seeding.Distributions(
+        session_minutes=args.minutes or seeding.Distributions().session_minutes,
+        bets=args.bets or seeding.Distributions().bets,
+        machines=args.machines or seeding.Distributions().machines,
+        activity_sigma=args.activity_sigma,
+        history_days=args.history_days,
+    )
+    end = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else None
+    log = (lambda line: None) if args.json else print
+    try:
+        result = seeding.generate(engine, args.users, args.sessions, args.spins, seed=args.seed, end=end, dist=dist, log=log)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"seeded {result['users']:,} users, {result['sessions']:,} sessions, {result['spins']:,} spins "
+          f"(seed {result['seed']}, ending {result['end']})")
+    for phase, seconds in result["seconds"].items():
+        print(f"  {phase:12}{seconds:8.1f}s")
+    print(f"  {result['rows_per_second']:,} rows/s, log in as user<N> / {seeding.SEED_PASSWORD}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Lockin maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "migrate", help="apply pending schema migrations"
+    ).set_defaults(func=migrate)
+
+    commands.add_parser(
+        "backfill-rollups", help="rebuild daily study rollups from study sessions"
+    ).set_defaults(func=backfill_rollups)
+
+    check = commands.add_parser(
+        "check-casino-stats", help="verify casino counters against casino spins"
+    )
+    check.add_argument("--fix", action="store_true", help="rebuild counters when out of sync")
+    check.set_defaults(func=check_casino_stats)
+
+    sim = commands.add_parser("simulate", help="Monte Carlo report for slot machine configuration")
+    sim.add_argument("--machine", type=int, help="machine id (default: all)")
+    sim.add_argument("--bet", type=int, default=100)
+    sim.add_argument("--spins", type=int, default=100_000_000)
+    sim.add_argument("--players", type=int, default=10_000, help="players per ruin curve")
+    sim.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    sim.add_argument("--seed", type=int)
+    sim.add_argument("--json", action="store_true", help="machine-readable output")
+    sim.set_defaults(func=simulate)
+
+    static = commands.add_parser("compress-static", help="precompress the built SPA (brotli / gzip)")
+    static.add_argument("--directory", type=Path, help="default: frontend/dist")
+    static.set_defaults(func=compress_static)
+
+    archiving = commands.add_parser("archive-spins", help="move old casino spins to monthly archive tables")
+    archiving.add_argument("--days", type=int, help="days of spins to keep (default: config)")
+    archiving.set_defaults(func=archive_spins)
+
+    commands.add_parser(
+        "recompute-progress", help="rebuild study totals and streaks from study sessions"
+    ).set_defaults(func=recompute_progress)
+
+    fill = commands.add_parser("seed", help="fill an empty database with synthetic data (needs numpy)")
+    fill.add_argument("--users", type=int, default=100_000)
+    fill.add_argument("--sessions", type=int, default=10_000_000)
+    fill.add_argument("--spins", type=int, default=20_000_000)
+    fill.add_argument("--seed", type=int, default=0)
+    fill.add_argument("--end", help="last day of history, YYYY-MM-DD (default: today)")
+    fill.add_argument("--history-days", type=int, default=90)
+    fill.add_argument("--minutes", type=_weights, help="session length weights, e.g. 25:50,50:30,60:20")
+    fill.add_argument("--bets", type=_weights, help="bet weights, e.g. 10:50,100:50")
+    fill.add_argument("--machines", type=_weights, help="machine weights, e.g. 1:60,2:25,3:15")
+    fill.add_argument("--activity-sigma", type=float, default=1.0, help="lognormal spread of per-user activity")
+    fill.add_argument("--json", action="store_true", help="machine-readable output")
+    fill.set_defaults(func=seed)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Casino spin archival
+
+casino_spins keeps the last `archive_after_days` days only. Older spins
+are moved, one day per transaction, into monthly archive tables
+(casino_spins_archive_YYYYMM, same columns, no secondary indexes) and
+summed into casino_daily_summaries (per user and day), so the live table
+and its indexes stay proportional to the window. Casino counters are
+unaffected: checks and rebuilds read the summaries as well.
+
+Run with:
+    python -m app.cli archive-spins [--days 90]
+or let the app do it every CASINO["archive_interval_seconds"].
+"""
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import Date, DateTime, bindparam, func, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .models import CasinoSpinTable
+
+ARCHIVE_PREFIX = "casino_spins_archive_"
+_DAY_RANGE = "created_at >= :start AND created_at < :end"
+
+
+def archive_table(day: date) -> str:
+    """Monthly archive table holding the spins of `day`"""
+    return f"{ARCHIVE_PREFIX}{day:%Y%m}"
+
+
+def _day_sql(sql: str):
+    binds = [bindparam("start", type_=DateTime), bindparam("end", type_=DateTime)]
+    if ":day" in sql:
+        binds.append(bindparam("day", type_=Date))
+    return text(sql).bindparams(*binds)
+
+
+def oldest_spin_day(db: Session) -> Optional[date]:
+    """Day of the oldest live spin (index lookup)"""
+    oldest = db.query(func.min(CasinoSpinTable.created_at)).scalar()
+    return oldest.date() if oldest is not None else None
+
+
+def archive_day(db: Session, day: date) -> int:
+    """
+    Moves one day of live spins to its archive table and daily summaries
+
+    Does not commit. Returns number of spins moved
+    """
+    table = archive_table(day)
+    start = datetime.combine(day, datetime.min.time())
+    params = {"start": start, "end": start + timedelta(days=1), "day": day}
+
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        "id INTEGER PRIMARY KEY, "
+        "user_id INTEGER NOT NULL, "
+        "bet_amount INTEGER NOT NULL, "
+        "reels INTEGER NOT NULL, "
+        "win_amount INTEGER, "
+        "created_at TIMESTAMP)"
+    ))
+    db.execute(_day_sql(
+        f"INSERT INTO {table} (id, user_id, bet_amount, reels, win_amount, created_at) "
+        f"SELECT id, user_id, bet_amount, reels, win_amount, created_at FROM casino_spins WHERE {_DAY_RANGE}"
+    ), params)
+    db.execute(_day_sql(
+        "INSERT INTO casino_daily_summaries (user_id, day, spins, wins, bets, winnings) "
+        "SELECT user_id, :day, COUNT(*), SUM(CASE WHEN win_amount > 0 THEN 1 ELSE 0 END), "
+        "SUM(bet_amount), COALESCE(SUM(win_amount), 0) "
+        f"FROM casino_spins WHERE {_DAY_RANGE} GROUP BY user_id "
+        "ON CONFLICT (user_id, day) DO UPDATE SET "
+        "spins = casino_daily_summaries.spins + excluded.spins, "
+        "wins = casino_daily_summaries.wins + excluded.wins, "
+        "bets = casino_daily_summaries.bets + excluded.bets, "
+        "winnings = casino_daily_summaries.winnings + excluded.winnings"
+    ), params)
+    return db.execute(_day_sql(f"DELETE FROM casino_spins WHERE {_DAY_RANGE}"), params).rowcount
+
+
+def archive_spins(engine: Engine, keep_days: int, today: Optional[date] = None,
+                  log: Callable[[str], None] = lambda line: None) -> dict:
+    """
+    Archives every day older than the last `keep_days` days (today included)
+
+    Returns {"days", "spins", "before"}
+    """
+    if keep_days < 1:
+        raise ValueError("keep_days must be at least 1, today's spins feed the daily counters")
+    before = (today or datetime.utcnow().date()) - timedelta(days=keep_days - 1)
+
+    days = spins = 0
+    while True:
+        with Session(engine) as db, db.begin():
+            day = oldest_spin_day(db)
+            if day is None or day >= before:
+                break
+            moved = archive_day(db, day)
+        days += 1
+        spins += moved
+        log(f"{day}: {moved:,} spins -> {archive_table(day)}")
+    return {"days": days, "spins": spins, "before": before.isoformat()}
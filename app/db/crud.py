@@ -0,0 +1,246 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Date, DateTime, bindparam, text
+from sqlalchemy.orm import Session
+
+
+# ---------------------------
+# STUDY ROLLUPS
+# ---------------------------
+
+def add_study_rollup(db: Session, user_id: int, started_at: datetime, duration_minutes: int):
+    """
+    Adds one study session to the (user_id, day) rollup row
+
+    Does not commit: call it in the same transaction as the session insert
+    """
+    db.execute(
+        text(
+            "INSERT INTO study_daily_rollups (user_id, day, sessions, minutes) "
+            "VALUES (:user_id, :day, 1, :minutes) "
+            "ON CONFLICT (user_id, day) DO UPDATE SET "
+            "sessions = study_daily_rollups.sessions + 1, minutes = study_daily_rollups.minutes + excluded.minutes"
+        ).bindparams(bindparam("day", type_=Date)),
+        {"user_id": user_id, "day": started_at.date(), "minutes": duration_minutes},
+    )
+
+
+def get_study_rollup(db: Session, user_id: int, today: date) -> Tuple[int, int]:
+    """
+    Returns (sessions today, minutes since monday)
+
+    Reads at most seven rollup rows
+    """
+    week_start = today - timedelta(days=today.weekday())
+    rows = db.execute(
+        text(
+            "SELECT day, sessions, minutes FROM study_daily_rollups "
+            "WHERE user_id = :user_id AND day >= :week_start"
+        ).bindparams(bindparam("week_start", type_=Date)).columns(day=Date),
+        {"user_id": user_id, "week_start": week_start},
+    ).all()
+
+    sessions_today = sum(sessions for day, sessions, _ in rows if day == today)
+    weekly_minutes = sum(minutes for _, _, minutes in rows)
+    return sessions_today, weekly_minutes
+
+
+def get_community_stats(db: Session, today: date) -> dict:
+    """
+    Community wide counts from users and the rollups since monday
+
+    Scans the week's rollup rows, served through the response cache
+    """
+    week_start = today - timedelta(days=today.weekday())
+    total_students = db.execute(text("SELECT COUNT(*) FROM users")).scalar()
+    row = db.execute(
+        text(
+            "SELECT COUNT(DISTINCT user_id) AS active_this_week, "
+            "COUNT(DISTINCT CASE WHEN day = :today THEN user_id END) AS active_today, "
+            "COALESCE(SUM(CASE WHEN day = :today THEN sessions END), 0) AS sessions_today, "
+            "COALESCE(SUM(CASE WHEN day = :today THEN minutes END), 0) AS minutes_today "
+            "FROM study_daily_rollups WHERE day >= :week_start"
+        ).bindparams(bindparam("today", type_=Date), bindparam("week_start", type_=Date)),
+        {"today": today, "week_start": week_start},
+    ).one()
+    return {"total_students": total_students, **row._asdict()}
+
+
+def backfill_study_rollups(db: Session) -> int:
+    """
+    Rebuilds all rollup rows from study_sessions
+
+    Does not commit. Returns number of rollup rows written
+    """
+    db.execute(text("DELETE FROM study_daily_rollups"))
+    result = db.execute(text(
+        "INSERT INTO study_daily_rollups (user_id, day, sessions, minutes) "
+        "SELECT user_id, date(started_at), COUNT(*), COALESCE(SUM(duration_minutes), 0) "
+        "FROM study_sessions WHERE started_at IS NOT NULL "
+        "GROUP BY user_id, date(started_at)"
+    ))
+    return result.rowcount
+
+
+# ---------------------------
+# CASINO COUNTERS
+# ---------------------------
+
+def add_casino_stats(db: Session, user_id: int, day: date, spins: int, wins: int, winnings: int):
+    """
+    Adds spins to the user's casino counters
+
+    Does not commit: call it in the same transaction as the spin insert
+    """
+    db.execute(
+        text(
+            "INSERT INTO casino_user_stats "
+            "(user_id, total_spins, wins, total_winnings, spin_day, spins_on_day) "
+            "VALUES (:user_id, :spins, :wins, :winnings, :day, :spins) "
+            "ON CONFLICT (user_id) DO UPDATE SET "
+            "total_spins = casino_user_stats.total_spins + excluded.total_spins, "
+            "wins = casino_user_stats.wins + excluded.wins, "
+            "total_winnings = casino_user_stats.total_winnings + excluded.total_winnings, "
+            "spins_on_day = CASE WHEN casino_user_stats.spin_day = excluded.spin_day "
+            "THEN casino_user_stats.spins_on_day + excluded.spins_on_day ELSE excluded.spins_on_day END, "
+            "spin_day = excluded.spin_day"
+        ).bindparams(bindparam("day", type_=Date)),
+        {"user_id": user_id, "spins": spins, "wins": wins, "winnings": winnings, "day": day},
+    )
+
+
+# live spins plus the daily summaries of archived ones
+_CASINO_STATS_FROM_SPINS = (
+    "SELECT user_id, SUM(total_spins) AS total_spins, SUM(wins) AS wins, "
+    "SUM(total_winnings) AS total_winnings, SUM(spins_today) AS spins_today FROM ("
+    "SELECT user_id, COUNT(*) AS total_spins, "
+    "SUM(CASE WHEN win_amount > 0 THEN 1 ELSE 0 END) AS wins, "
+    "COALESCE(SUM(win_amount), 0) AS total_winnings, "
+    "SUM(CASE WHEN date(created_at) = :today THEN 1 ELSE 0 END) AS spins_today "
+    "FROM casino_spins GROUP BY user_id "
+    "UNION ALL "
+    "SELECT user_id, SUM(spins), SUM(wins), SUM(winnings), "
+    "SUM(CASE WHEN day = :today THEN spins ELSE 0 END) "
+    "FROM casino_daily_summaries GROUP BY user_id"
+    ") AS parts GROUP BY user_id"
+)
+
+
+def check_casino_stats(db: Session, today: date) -> List[int]:
+    """
+    Compares casino counters with casino_spins and archived summaries
+
+    Returns ids of users whose counters drifted
+    """
+    rows = db.execute(
+        text(
+            f"SELECT s.user_id FROM ({_CASINO_STATS_FROM_SPINS}) AS s "
+            "LEFT JOIN casino_user_stats AS c ON c.user_id = s.user_id "
+            "WHERE c.user_id IS NULL "
+            "OR c.total_spins != s.total_spins OR c.wins != s.wins "
+            "OR c.total_winnings != s.total_winnings "
+            "OR (CASE WHEN c.spin_day = :today THEN c.spins_on_day ELSE 0 END) != s.spins_today "
+            "UNION "
+            "SELECT c.user_id FROM casino_user_stats AS c "
+            "WHERE c.total_spins > 0 "
+            "AND NOT EXISTS (SELECT 1 FROM casino_spins WHERE user_id = c.user_id) "
+            "AND NOT EXISTS (SELECT 1 FROM casino_daily_summaries WHERE user_id = c.user_id)"
+        ).bindparams(bindparam("today", type_=Date)),
+        {"today": today},
+    ).scalars().all()
+    return sorted(rows)
+
+
+def rebuild_casino_stats(db: Session, today: date) -> int:
+    """
+    Rebuilds all casino counters from casino_spins and archived summaries
+
+    Does not commit. Returns number of counter rows written
+    """
+    db.execute(text("DELETE FROM casino_user_stats"))
+    result = db.execute(
+        text(
+            "INSERT INTO casino_user_stats "
+            "(user_id, total_spins, wins, total_winnings, spin_day, spins_on_day) "
+            "SELECT user_id, total_spins, wins, total_winnings, :today, spins_today "
+            f"FROM ({_CASINO_STATS_FROM_SPINS}) AS s"
+        ).bindparams(bindparam("today", type_=Date)),
+        {"today": today},
+    )
+    return result.rowcount
+
+
+# ---------------------------
+# WRITE LOCKS
+# ---------------------------
+
+def begin_write(db: Session):
+    """
+    Takes the write lock up front, for read-modify-write transactions
+
+    SQLite has one writer: BEGIN IMMEDIATE makes concurrent writers
+    (other workers) wait before they read, instead of at their first
+    write. Other backends lock the rows they read with SELECT ... FOR UPDATE.
+    Must run before any other statement of the transaction.
+    """
+    if db.connection().dialect.name == "sqlite":
+        db.execute(text("BEGIN IMMEDIATE"))
+
+
+# ---------------------------
+# BALANCE
+# ---------------------------
+
+def apply_points(db: Session, user_id: int, debit: int, credit: int, required: int) -> Optional[int]:
+    """
+    Atomically moves user's points by `credit - debit`
+
+    The row is only updated if the user has at least `required` points,
+    so two concurrent spins cannot both spend the same balance.
+    Does not commit. Returns new balance, None if not enough points
+    """
+    return db.execute(
+        text(
+            "UPDATE users SET points = points - :debit + :credit "
+            "WHERE id = :user_id AND points >= :required "
+            "RETURNING points"
+        ),
+        {"user_id": user_id, "debit": debit, "credit": credit, "required": required},
+    ).scalar()
+
+
+# ---------------------------
+# BACKGROUND JOBS
+# ---------------------------
+
+def claim_job(db: Session, name: str, slot: int, now: datetime, stale_before: datetime) -> bool:
+    """
+    Claims run `slot` of the in-process job `name` for this process
+
+    Every worker schedules the same jobs; the claim row makes one of them
+    run each slot. A slot is only claimed after the previous run finished,
+    or started before `stale_before` (crashed). Does not commit.
+    Returns False when another process has it
+    """
+    return db.execute(
+        text(
+            "INSERT INTO background_jobs (name, slot, started_at, finished_at) "
+            "VALUES (:name, :slot, :now, NULL) "
+            "ON CONFLICT (name) DO UPDATE SET "
+            "slot = excluded.slot, started_at = excluded.started_at, finished_at = NULL "
+            "WHERE background_jobs.slot < excluded.slot AND (background_jobs.finished_at IS NOT NULL "
+            "OR background_jobs.started_at < :stale_before)"
+        ).bindparams(bindparam("now", type_=DateTime), bindparam("stale_before", type_=DateTime)),
+        {"name": name, "slot": slot, "now": now, "stale_before": stale_before},
+    ).rowcount == 1
+
+
+def finish_job(db: Session, name: str, slot: int, now: datetime):
+    """Marks run `slot` of `name` done, so the next slot can be claimed. Does not commit"""
+    db.execute(
+        text(
+            "UPDATE background_jobs SET finished_at = :now WHERE name = :name AND slot = :slot"
+        ).bindparams(bindparam("now", type_=DateTime)),
+        {"name": name, "slot": slot, "now": now},
+    )
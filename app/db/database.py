@@ -1,17 +1,76 @@
-from pathlib import Path
-
-from sqlalchemy import create_engine
+from config import properties
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-DB_PATH = BASE_DIR / "db" / "app.db"
+DATABASE = properties["database"]
+DATABASE_URL = DATABASE["url"]
 
-DATABASE_URL = f"sqlite:///{DB_PATH}"
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
+# ---------------------------
+# ENGINE FACTORY
+# ---------------------------
+
+def _async_url(url: URL) -> URL:
+    """sqlite:// -> sqlite+aiosqlite://, postgresql:// -> postgresql+asyncpg://"""
+    if "+" in url.drivername:
+        return url
+    driver = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}[url.get_backend_name()]
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def _memory_sqlite(url: URL) -> bool:
+    """In-memory SQLite: SQLAlchemy gives it a single-connection pool"""
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in DATABASE["sqlite_pragmas"].items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL, is_async: bool = False):
+    """
+    Creates engine for the configured backend
+
+    - SQLite: WAL, synchronous=NORMAL, busy_timeout, mmap and cache pragmas
+      on every new connection
+    - file SQLite and other backends: pooled connections sized from config
+      (in-memory SQLite keeps SQLAlchemy's single-connection pool)
+    """
+    url = make_url(url)
+    kwargs = {}
+
+    if url.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"check_same_thread": False}
+    else:
+        kwargs["pool_pre_ping"] = True
+        kwargs["pool_recycle"] = DATABASE["pool_recycle"]
+
+    if not _memory_sqlite(url):
+        kwargs["pool_size"] = DATABASE["pool_size"]
+        kwargs["max_overflow"] = DATABASE["max_overflow"]
+
+    if is_async:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        new_engine = create_async_engine(_async_url(url), **kwargs)
+        sync_engine = new_engine.sync_engine
+    else:
+        new_engine = sync_engine = create_engine(url, **kwargs)
+
+    if url.get_backend_name() == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+    return new_engine
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -28,3 +87,41 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------------------
+# SYNC / ASYNC SESSION RUNNER
+# ---------------------------
+
+class Database:
+    """
+    Runs a unit of work `fn(session, *args)` without blocking the event loop
+
+    - sync mode: opens a Session and runs fn in the threadpool
+    - async mode: opens an AsyncSession and runs fn through `run_sync`,
+      so database I/O is awaited on the loop and no worker thread is held
+    """
+    def __init__(self, session_factory, is_async: bool = False):
+        self.session_factory = session_factory
+        self.is_async = is_async
+
+    async def run(self, fn, *args, **kwargs):
+        if self.is_async:
+            async with self.session_factory() as session:
+                return await session.run_sync(fn, *args, **kwargs)
+        return await run_in_threadpool(self._run_sync, fn, *args, **kwargs)
+
+    def _run_sync(self, fn, *args, **kwargs):
+        with self.session_factory() as session:
+            return fn(session, *args, **kwargs)
+
+
+if DATABASE["mode"] == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = create_db_engine(is_async=True)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    database = Database(AsyncSessionLocal, is_async=True)
+else:
+    async_engine = None
+    database = Database(SessionLocal)
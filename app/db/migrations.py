@@ -0,0 +1,225 @@
+"""
+Versioned schema migrations
+
+Each migration runs once, in its own transaction, and records its version
+in the schema_version table. A fresh database is created from the models
+and stamped with every version; migrations are still written to be
+idempotent, so older databases created by `create_all` upgrade safely.
+
+Run with:
+    python -m app.cli migrate
+"""
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import Date, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import crud, models
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Session], None]
+
+
+MIGRATIONS: List[Migration] = []
+SCHEMA_LOCK_KEY = 0x4C6F636B496E  # pg_advisory_xact_lock key
+
+
+def migration(version: int, name: str):
+    """Registers migration function under the given version"""
+    def decorator(func):
+        MIGRATIONS.append(Migration(version, name, func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+
+# ---------------------------
+# MIGRATIONS
+# ---------------------------
+
+@migration(1, "users progress columns")
+def _users_progress_columns(db: Session):
+    existing = {col["name"] for col in inspect(db.connection()).get_columns("users")}
+    for col, type_, default in [
+        ("points", "INTEGER", "0"),
+        ("total_study_minutes", "INTEGER", "0"),
+        ("current_streak", "INTEGER", "0"),
+        ("last_study_date", "TEXT", "NULL"),
+    ]:
+        if col not in existing:
+            db.execute(text(f"ALTER TABLE users ADD COLUMN {col} {type_} DEFAULT {default}"))
+    # Give users from before the points column starting points (a balance
+    # of 0 may have been spent at the casino)
+    if "points" not in existing:
+        db.execute(text("UPDATE users SET points = 1000"))
+    db.execute(text("UPDATE users SET points = 1000 WHERE points IS NULL"))
+
+
+@migration(2, "index study_sessions (user_id, started_at)")
+def _study_sessions_user_started(db: Session):
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_study_sessions_user_started "
+        "ON study_sessions (user_id, started_at)"
+    ))
+
+
+@migration(3, "index casino_spins (user_id, created_at)")
+def _casino_spins_user_created(db: Session):
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_casino_spins_user_created "
+        "ON casino_spins (user_id, created_at)"
+    ))
+
+
+@migration(4, "index users (total_study_minutes)")
+def _users_total_study_minutes(db: Session):
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_total_study_minutes "
+        "ON users (total_study_minutes)"
+    ))
+
+
+@migration(5, "backfill study rollups and casino counters")
+def _backfill_aggregates(db: Session):
+    crud.backfill_study_rollups(db)
+    crud.rebuild_casino_stats(db, datetime.utcnow().date())
+
+
+@migration(6, "study_sessions idempotency keys")
+def _study_sessions_idempotency_key(db: Session):
+    existing = {col["name"] for col in inspect(db.connection()).get_columns("study_sessions")}
+    if "idempotency_key" not in existing:
+        db.execute(text("ALTER TABLE study_sessions ADD COLUMN idempotency_key VARCHAR"))
+    db.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_study_sessions_user_idempotency "
+        "ON study_sessions (user_id, idempotency_key)"
+    ))
+
+
+@migration(7, "casino_spins packed reels")
+def _casino_spins_packed_reels(db: Session):
+    existing = {col["name"] for col in inspect(db.connection()).get_columns("casino_spins")}
+    if "reels" not in existing:
+        db.execute(text("ALTER TABLE casino_spins ADD COLUMN reels INTEGER NOT NULL DEFAULT 0"))
+    if "result_slots" in existing:
+        # "[a, b, c]" -> a | b << 8 | c << 16 (slots.pack_reels)
+        if db.connection().dialect.name == "sqlite":
+            slot = "json_extract(result_slots, '$[{}]')"
+        else:
+            slot = "CAST(CAST(result_slots AS json) ->> {} AS INTEGER)"
+        db.execute(text(
+            f"UPDATE casino_spins SET reels = "
+            f"{slot.format(0)} | ({slot.format(1)} << 8) | ({slot.format(2)} << 16)"
+        ))
+        db.execute(text("ALTER TABLE casino_spins DROP COLUMN result_slots"))
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_casino_spins_created "
+        "ON casino_spins (created_at)"
+    ))
+
+
+@migration(8, "users.last_study_date as DATE")
+def _users_last_study_date(db: Session):
+    column = {col["name"]: col for col in inspect(db.connection()).get_columns("users")}["last_study_date"]
+    if isinstance(column["type"], Date):
+        return
+    # free-form strings: anything that is not a date becomes NULL
+    if db.connection().dialect.name == "sqlite":
+        db.execute(text("ALTER TABLE users ADD COLUMN last_study_day DATE"))
+        db.execute(text("UPDATE users SET last_study_day = date(last_study_date)"))
+        db.execute(text("ALTER TABLE users DROP COLUMN last_study_date"))
+        db.execute(text("ALTER TABLE users RENAME COLUMN last_study_day TO last_study_date"))
+    else:
+        db.execute(text(
+            "ALTER TABLE users ALTER COLUMN last_study_date TYPE DATE USING "
+            "CASE WHEN last_study_date ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}' "
+            "THEN CAST(substr(last_study_date, 1, 10) AS DATE) END"
+        ))
+
+
+# ---------------------------
+# RUNNER
+# ---------------------------
+
+def _ensure_version_table(db: Session):
+    db.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def _lock_schema(db: Session):
+    """Serializes schema creation of workers starting together"""
+    dialect = db.connection().dialect.name
+    if dialect == "sqlite":
+        crud.begin_write(db)
+    elif dialect == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+
+
+def _stamp(db: Session, versions: List[Migration]):
+    for m in versions:
+        db.execute(
+            text(
+                "INSERT INTO schema_version (version, name, applied_at) "
+                "SELECT :version, :name, :applied_at "
+                "WHERE NOT EXISTS (SELECT 1 FROM schema_version WHERE version = :version)"
+            ),
+            {"version": m.version, "name": m.name, "applied_at": datetime.utcnow()},
+        )
+
+
+def create_schema(engine: Engine) -> bool:
+    """
+    Creates missing tables from the models
+
+    A fresh database (no users table) gets the current schema, so every
+    migration is stamped as applied. Returns True for a fresh database
+    """
+    with Session(engine) as db, db.begin():
+        _lock_schema(db)
+        fresh = not inspect(db.connection()).has_table("users")
+        models.Base.metadata.create_all(bind=db.connection())
+        _ensure_version_table(db)
+        if fresh:
+            _stamp(db, MIGRATIONS)
+    return fresh
+
+
+def current_version(engine: Engine) -> int:
+    """Returns latest applied migration version (0 for a fresh database)"""
+    if not inspect(engine).has_table("schema_version"):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def pending(engine: Engine) -> List[Migration]:
+    """Returns migrations not yet applied, in order"""
+    version = current_version(engine)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def migrate(engine: Engine) -> List[Migration]:
+    """
+    Applies pending migrations in order
+
+    Missing tables are created from the models first (a fresh database
+    is stamped up to date). Returns applied migrations
+    """
+    create_schema(engine)
+
+    applied = []
+    for m in pending(engine):
+        with Session(engine) as db, db.begin():
+            m.apply(db)
+            _stamp(db, [m])
+        applied.append(m)
+    return applied
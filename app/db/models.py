@@ -1,46 +1,117 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import List
+
+from sqlalchemy import BigInteger, Column, Date, DateTime, ForeignKey, Index, Integer, String
 
 from .database import Base
+from ..services.slots import pack_reels, unpack_reels
 
 
 class User(Base):
     __tablename__ = "users"
-
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, nullable=False)
     email = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
     points = Column(Integer, default=0)
-    total_study_minutes = Column(Integer, default=0)
+    total_study_minutes = Column(Integer, default=0, index=True)
     current_streak = Column(Integer, default=0)
-    last_study_date = Column(String, nullable=True)
+    last_study_date = Column(Date, nullable=True)
 
-    sessions = relationship("StudySession", back_populates="user")
-    spins = relationship("CasinoSpin", back_populates="user")
 
-
-class StudySession(Base):
+class StudySessionTable(Base):
     __tablename__ = "study_sessions"
-
+    __table_args__ = (
+        Index("ix_study_sessions_user_started", "user_id", "started_at"),
+        Index("ux_study_sessions_user_idempotency", "user_id", "idempotency_key", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     duration_minutes = Column(Integer, nullable=False)
     started_at = Column(DateTime, default=datetime.utcnow)
     ended_at = Column(DateTime, nullable=True)
+    idempotency_key = Column(String, nullable=True)
 
-    user = relationship("User", back_populates="sessions")
 
+class StudyDailyRollupTable(Base):
+    """Per-user daily totals of study_sessions (kept in sync on every session write)"""
+    __tablename__ = "study_daily_rollups"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+    minutes = Column(Integer, nullable=False, default=0)
 
-class CasinoSpin(Base):
-    __tablename__ = "casino_spins"
 
+class CasinoSpinTable(Base):
+    """Recent spins, older days are moved to monthly archive tables (see archive.py)"""
+    __tablename__ = "casino_spins"
+    __table_args__ = (
+        Index("ix_casino_spins_user_created", "user_id", "created_at"),
+        Index("ix_casino_spins_created", "created_at"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     bet_amount = Column(Integer, nullable=False)
-    result_slots = Column(String, nullable=False)  # JSON "[0,3,5]"
+    reels = Column(Integer, nullable=False)  # slots.pack_reels
     win_amount = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    user = relationship("User", back_populates="spins")
+    @property
+    def result_slots(self) -> List[int]:
+        """Reel positions as a list (the column used to be a JSON string)"""
+        return unpack_reels(self.reels)
+
+    @result_slots.setter
+    def result_slots(self, slots: List[int]):
+        self.reels = pack_reels(slots)
+
+
+class CasinoDailySummaryTable(Base):
+    """Per-user daily totals of archived spins"""
+    __tablename__ = "casino_daily_summaries"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    spins = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    bets = Column(Integer, nullable=False, default=0)
+    winnings = Column(Integer, nullable=False, default=0)
+
+
+class ReportTable(Base):
+    """Violation reports, the id is the report number (never reused)"""
+    __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_reports_reporter_created", "reporter_id", "created_at"),
+        Index("ix_reports_student_created", "student_name", "created_at"),
+        Index("ix_reports_created", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+    id = Column(Integer, primary_key=True)
+    reporter_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    student_name = Column(String, nullable=False)
+    violation_type = Column(String, nullable=False)
+    description = Column(String, nullable=False, default="")
+    image_path = Column(String, nullable=True)  # relative to PATHS["reports"]
+    image_type = Column(String, nullable=True)
+    image_size = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CasinoUserStatsTable(Base):
+    """Per-user casino counters (kept in sync on every spin)"""
+    __tablename__ = "casino_user_stats"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_spins = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    total_winnings = Column(Integer, nullable=False, default=0)
+    spin_day = Column(Date, nullable=True)
+    spins_on_day = Column(Integer, nullable=False, default=0)
+
+
+class BackgroundJobTable(Base):
+    """Latest run of each in-process job, claimed by one worker (see crud.claim_job)"""
+    __tablename__ = "background_jobs"
+    name = Column(String, primary_key=True)
+    slot = Column(BigInteger, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
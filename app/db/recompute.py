@@ -0,0 +1,168 @@
+"""
+Study progress recomputation
+
+users.total_study_minutes, current_streak and last_study_date are
+counters kept up to date by every study completion. This job rebuilds
+them for all users from study_sessions in one streaming pass, ordered
+by (user_id, started_at), so memory stays at one chunk of users:
+
+- total minutes: sum of session durations
+- last study date: day the latest session ended (as the live path)
+- streak: consecutive days ending on the last study date, 0 once that
+  is older than yesterday (the live path only resets on the next study)
+- users without sessions are zeroed
+
+Only rows that differ are written, in chunked bulk updates. Sessions
+written while the job runs are not read; their users are skipped and
+picked up by the next run, so live completions are never overwritten.
+
+Run with:
+    python -m app.cli recompute-progress
+or let the app do it nightly at STUDY["recompute_at"] (UTC).
+"""
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Date, bindparam, text
+from sqlalchemy.engine import Engine
+
+CHUNK = 10_000
+
+Progress = Tuple[int, int, int, Optional[date]]  # user_id, minutes, streak, last study date
+
+
+def _stream_progress(conn, max_session_id: int, today: date):
+    """Yields Progress per user, from sessions up to max_session_id"""
+    rows = conn.execution_options(yield_per=CHUNK).execute(
+        text(
+            "SELECT user_id, date(COALESCE(ended_at, started_at)) AS day, duration_minutes FROM study_sessions "
+            "WHERE id <= :max_id AND started_at IS NOT NULL "
+            "ORDER BY user_id, started_at"
+        ).columns(day=Date),
+        {"max_id": max_session_id},
+    )
+    yesterday = today - timedelta(days=1)
+    user_id = last = None
+    minutes = streak = 0
+    for row_user, day, duration in rows:
+        if row_user != user_id:
+            if user_id is not None:
+                yield user_id, minutes, streak if last >= yesterday else 0, last
+            user_id, minutes, streak, last = row_user, 0, 0, None
+        minutes += duration or 0
+        if last is None or day > last:
+            streak = streak + 1 if last is not None and day - last == timedelta(days=1) else 1
+            last = day
+    if user_id is not None:
+        yield user_id, minutes, streak if last >= yesterday else 0, last
+
+
+def _write_chunk(engine: Engine, chunk: List[Progress], max_session_id: int):
+    """Writes rows that differ, returns [(user_id, username, minutes)] written"""
+    with engine.begin() as conn:
+        current = {
+            row.id: row
+            for row in conn.execute(
+                text(
+                    "SELECT id, username, total_study_minutes, current_streak, last_study_date "
+                    "FROM users WHERE id IN :ids"
+                ).bindparams(bindparam("ids", expanding=True)).columns(last_study_date=Date),
+                {"ids": [user_id for user_id, *_ in chunk]},
+            )
+        }
+        changed = [
+            (user_id, minutes, streak, last)
+            for user_id, minutes, streak, last in chunk
+            if user_id in current and (
+                current[user_id].total_study_minutes,
+                current[user_id].current_streak,
+                current[user_id].last_study_date,
+            ) != (minutes, streak, last)
+        ]
+        if not changed:
+            return []
+        # users with sessions newer than the pass keep their live counters
+        result = conn.execute(
+            text(
+                "UPDATE users SET total_study_minutes = :minutes, current_streak = :streak, "
+                "last_study_date = :last WHERE id = :user_id "
+                "AND NOT EXISTS (SELECT 1 FROM study_sessions "
+                "WHERE study_sessions.user_id = :user_id AND study_sessions.id > :max_id)"
+            ).bindparams(bindparam("last", type_=Date)),
+            [
+                {"user_id": user_id, "minutes": minutes, "streak": streak, "last": last, "max_id": max_session_id}
+                for user_id, minutes, streak, last in changed
+            ],
+        )
+        if result.rowcount != len(changed):
+            # some users studied meanwhile: report only what was written
+            written = set(conn.execute(
+                text(
+                    "SELECT id FROM users WHERE id IN :ids AND NOT EXISTS (SELECT 1 FROM study_sessions "
+                    "WHERE study_sessions.user_id = users.id AND study_sessions.id > :max_id)"
+                ).bindparams(bindparam("ids", expanding=True)),
+                {"ids": [user_id for user_id, *_ in changed], "max_id": max_session_id},
+            ).scalars())
+            changed = [row for row in changed if row[0] in written]
+    return [(user_id, current[user_id].username, minutes) for user_id, minutes, _, _ in changed]
+
+
+def recompute_progress(
+    engine: Engine,
+    today: Optional[date] = None,
+    on_update: Callable[[List[Tuple[int, str, int]]], None] = lambda rows: None,
+    log: Callable[[str], None] = lambda line: None,
+) -> dict:
+    """
+    Recomputes study totals, streaks and last study dates of all users
+
+    `on_update` gets [(user_id, username, minutes)] after each written
+    chunk (cache invalidation, leaderboard index).
+    Returns {"users", "updated", "zeroed", "seconds"}
+    """
+    start = datetime.utcnow()
+    today = today or start.date()
+    with engine.connect() as conn:
+        max_session_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM study_sessions")).scalar()
+
+    users = updated = 0
+    chunk: List[Progress] = []
+    with engine.connect() as reader:
+        for progress in _stream_progress(reader, max_session_id, today):
+            users += 1
+            chunk.append(progress)
+            if len(chunk) >= CHUNK:
+                written = _write_chunk(engine, chunk, max_session_id)
+                updated += len(written)
+                on_update(written)
+                chunk = []
+                log(f"{users:,} users read, {updated:,} updated")
+        if chunk:
+            written = _write_chunk(engine, chunk, max_session_id)
+            updated += len(written)
+            on_update(written)
+
+    with engine.begin() as conn:
+        zeroed_ids = conn.execute(text(
+            "SELECT id, username FROM users WHERE "
+            "(COALESCE(total_study_minutes, 0) != 0 OR COALESCE(current_streak, 0) != 0 "
+            "OR last_study_date IS NOT NULL) "
+            "AND NOT EXISTS (SELECT 1 FROM study_sessions WHERE study_sessions.user_id = users.id)"
+        )).all()
+        if zeroed_ids:
+            conn.execute(
+                text(
+                    "UPDATE users SET total_study_minutes = 0, current_streak = 0, last_study_date = NULL "
+                    "WHERE id = :user_id "
+                    "AND NOT EXISTS (SELECT 1 FROM study_sessions WHERE study_sessions.user_id = :user_id)"
+                ),
+                [{"user_id": user_id} for user_id, _ in zeroed_ids],
+            )
+    on_update([(user_id, username, 0) for user_id, username in zeroed_ids])
+
+    return {
+        "users": users,
+        "updated": updated,
+        "zeroed": len(zeroed_ids),
+        "seconds": round((datetime.utcnow() - start).total_seconds(), 2),
+    }
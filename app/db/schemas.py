@@ -65,6 +65,56 @@ class LeaderboardResponse(BaseModel):
     my_study_minutes: int
 
 
+# ---------------------------
+# STUDY
+# ---------------------------
+
+class StudyCompleteRequest(BaseModel):
+    duration_minutes: int = Field(default=25, ge=1, le=240)
+
+
+class StudyCompleteResponse(BaseModel):
+    points_awarded: int
+    new_balance: int
+    total_study_minutes: int
+    current_streak: int
+    replayed: bool = False  # same Idempotency-Key was already recorded
+
+
+# ---------------------------
+# COMMUNITY
+# ---------------------------
+
+class ActivityEvent(BaseModel):
+    id: int
+    type: str  # "jackpot" | "study_session" | "streak"
+    username: str
+    value: int  # points won / minutes studied / streak days
+    created_at: datetime
+
+
+class CommunityStatsResponse(BaseModel):
+    total_students: int
+    active_today: int      # studied today
+    active_this_week: int  # studied since monday
+    sessions_today: int
+    minutes_today: int
+
+
+class ActivityFeedResponse(BaseModel):
+    events: List[ActivityEvent]
+
+
+# ---------------------------
+# REPORTS
+# ---------------------------
+
+class ReportResponse(BaseModel):
+    report_number: int
+    image: Optional[str]  # stored proof, relative to the reports folder
+    created_at: datetime
+
+
 # ---------------------------
 # CASINO
 # ---------------------------
@@ -82,6 +132,26 @@ class CasinoSpinResponse(BaseModel):
     new_balance: int
 
 
+class CasinoBatchSpinRequest(BaseModel):
+    bet_amount: int = Field(ge=10, le=500)
+    machine_id: int = Field(ge=1, le=3)
+    count: int = Field(ge=1)  # capped by config
+
+
+class CasinoSpinResult(BaseModel):
+    slots: List[int]
+    win_amount: int
+    is_jackpot: bool
+    is_double: bool
+
+
+class CasinoBatchSpinResponse(BaseModel):
+    spins: List[CasinoSpinResult]
+    total_bet: int
+    total_win: int
+    new_balance: int
+
+
 class CasinoStatsResponse(BaseModel):
     total_points: int
     total_winnings: int
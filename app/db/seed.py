@@ -0,0 +1,262 @@
+"""
+Synthetic data generator
+
+Fills a database with realistic-scale users, study sessions and casino
+spins straight through the driver (executemany in large transactions),
+without going through the API:
+
+- one Argon2 hash, computed once and shared by every user
+- per-user activity is lognormal, so a few users produce most rows
+- session lengths, bets and machines follow configurable weights,
+  spin outcomes are drawn from the real machine tables
+- totals, streaks, last study dates and points follow from the generated
+  rows, as the nightly recompute derives them (balances are floored at
+  start_points so every user can still play)
+- deterministic: the same seed and end date produce the same rows
+
+Secondary indexes are dropped during the load and rebuilt afterwards,
+then the derived tables (daily rollups, casino counters) are rebuilt.
+
+Run with:
+    python -m app.cli seed --users 100000 --sessions 10000000 --spins 20000000
+"""
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import properties
+from . import crud, migrations
+from .models import CasinoSpinTable, StudySessionTable, User
+from ..services.passwords import PASSWORDS, make_context
+from ..services.slots import MACHINES, draw_reels, pack_reels_array, payout_array
+
+SEED_PASSWORD = "loadtest-password"
+CHUNK = 500_000
+STUDY_POINTS = properties["study"]["points_per_session"]
+
+
+class Distributions(NamedTuple):
+    """Shape of the generated data (weights need not sum to 1)"""
+    session_minutes: Dict[int, float] = {25: 50, 30: 10, 45: 15, 50: 15, 60: 10}
+    bets: Dict[int, float] = {10: 50, 50: 30, 100: 15, 500: 5}
+    machines: Dict[int, float] = {1: 60, 2: 25, 3: 15}
+    activity_sigma: float = 1.0  # lognormal spread of per-user activity
+    history_days: int = 90
+    start_points: int = 1000
+
+
+def parse_weights(value: str) -> Dict[int, float]:
+    """"25:50,30:10" -> {25: 50.0, 30: 10.0}"""
+    weights = {}
+    for part in value.split(","):
+        key, _, weight = part.partition(":")
+        weights[int(key)] = float(weight or 1)
+    return weights
+
+
+def _choice(rng, weights: Dict[int, float], size: int):
+    keys = np.fromiter(weights, dtype=np.int64)
+    p = np.fromiter(weights.values(), dtype=float)
+    return keys[rng.choice(len(keys), size=size, p=p / p.sum())]
+
+
+def _streaks(studied):
+    """
+    (streak, days ago of the last study day or -1) per user, from a
+    users x days-ago matrix of study days (same rules as recompute.py)
+    """
+    width = studied.shape[1]
+    any_day = studied.any(axis=1)
+    last = np.where(any_day, studied.argmax(axis=1), -1)
+    # first day without study at or after the last study day
+    run = studied | (np.arange(width)[None, :] < last[:, None])
+    end = np.where(run.all(axis=1), width, (~run).argmax(axis=1))
+    # broken once the last study day is older than yesterday
+    streaks = np.where(any_day & (last <= 1), end - last, 0)
+    return streaks, last
+
+
+def _timestamps(end: datetime, seconds_ago):
+    """Seconds before `end` -> 'YYYY-MM-DD HH:MM:SS' strings (SQLAlchemy's SQLite format)"""
+    stamps = np.datetime64(end.replace(microsecond=0), "s") - seconds_ago.astype("timedelta64[s]")
+    return np.char.replace(np.datetime_as_string(stamps, unit="s"), "T", " ").tolist()
+
+
+class Loader:
+    """Raw executemany in the driver's own paramstyle"""
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        style = engine.dialect.paramstyle
+        if style not in ("qmark", "format", "pyformat"):
+            raise ValueError(f"unsupported paramstyle {style}")
+        self.placeholder = "?" if style == "qmark" else "%s"
+
+    def insert(self, table, columns, rows):
+        self.execute(
+            f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join(['{0}'] * len(columns))})",
+            rows,
+        )
+
+    def execute(self, sql: str, rows):
+        """`sql` with {0} for every parameter"""
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(sql.format(self.placeholder), rows)
+
+
+def _drop_indexes(engine: Engine, tables):
+    with engine.begin() as conn:
+        for table in tables:
+            for index in table.indexes:
+                index.drop(conn, checkfirst=True)
+
+
+def _create_indexes(engine: Engine, tables):
+    with engine.begin() as conn:
+        for table in tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def generate(
+    engine: Engine,
+    users: int,
+    sessions: int,
+    spins: int,
+    seed: int = 0,
+    end: Optional[date] = None,
+    dist: Distributions = Distributions(),
+    password: str = SEED_PASSWORD,
+    log: Callable[[str], None] = print,
+) -> dict:
+    """
+    Fills an empty database, every user logs in as user<N> / `password`
+
+    Returns {"users", "sessions", "spins", "seconds": {...}, "rows_per_second"}
+    """
+    unknown = set(dist.machines) - set(MACHINES)
+    if unknown:
+        raise ValueError(f"unknown machines {sorted(unknown)}")
+    migrations.migrate(engine)
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT COUNT(*) FROM users")).scalar():
+            raise ValueError("database already has users, seed an empty one")
+
+    end = datetime.combine(end or datetime.utcnow().date(), datetime.min.time()) + timedelta(hours=23, minutes=59)
+    history = dist.history_days * 86400
+    end_of_day = 86400 - 1 - (end.hour * 3600 + end.minute * 60)  # seconds after `end` within its day
+    rng = np.random.default_rng(seed)
+    loader = Loader(engine)
+    tables = [User.__table__, StudySessionTable.__table__, CasinoSpinTable.__table__]
+    timings = {}
+
+    # activity weights: who studies / spins how much
+    study_p = rng.lognormal(0, dist.activity_sigma, users)
+    study_p /= study_p.sum()
+    spin_p = rng.lognormal(0, dist.activity_sigma, users)
+    spin_p /= spin_p.sum()
+
+    minutes_total = np.zeros(users + 1, dtype=np.int64)
+    sessions_count = np.zeros(users + 1, dtype=np.int64)
+    net_points = np.zeros(users + 1, dtype=np.int64)
+    studied = np.zeros((users + 1, dist.history_days + 1), dtype=bool)  # user x days before `end`
+
+    _drop_indexes(engine, tables)
+    try:
+        # users first (foreign keys), their totals follow from the generated rows
+        start = time.perf_counter()
+        password_hash = make_context(PASSWORDS["argon2"]).hash(password)
+        loader.insert(
+            User.__table__,
+            ("id", "username", "email", "password_hash", "points", "total_study_minutes", "current_streak"),
+            [(i, f"user{i}", f"user{i}@example.com", password_hash, 0, 0, 0) for i in range(1, users + 1)],
+        )
+        timings["users"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, sessions, CHUNK):
+            size = min(CHUNK, sessions - offset)
+            user_ids = rng.choice(users, size=size, p=study_p) + 1
+            minutes = _choice(rng, dist.session_minutes, size)
+            ago = rng.integers(0, history, size)
+            minutes_total += np.bincount(user_ids, weights=minutes, minlength=users + 1).astype(np.int64)
+            sessions_count += np.bincount(user_ids, minlength=users + 1)
+            studied[user_ids, (ago + end_of_day) // 86400] = True  # day the session ended
+            loader.insert(
+                StudySessionTable.__table__,
+                ("user_id", "duration_minutes", "started_at", "ended_at"),
+                list(zip(user_ids.tolist(), minutes.tolist(), _timestamps(end, ago + minutes * 60), _timestamps(end, ago))),
+            )
+            log(f"study_sessions: {offset + size:,} / {sessions:,}")
+        timings["sessions"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, spins, CHUNK):
+            size = min(CHUNK, spins - offset)
+            user_ids = rng.choice(users, size=size, p=spin_p) + 1
+            bets = _choice(rng, dist.bets, size)
+            machine_ids = _choice(rng, dist.machines, size)
+            reels = np.empty((size, 3), dtype=np.int8)
+            wins = np.empty(size, dtype=np.int64)
+            for machine_id in dist.machines:
+                mask = machine_ids == machine_id
+                machine = MACHINES[machine_id]
+                reels[mask] = draw_reels(int(mask.sum()), machine, rng)
+                for bet in dist.bets:
+                    # doubles pay by bet, evaluate each bet size on its own rows
+                    rows = mask & (bets == bet)
+                    wins[rows] = payout_array(reels[rows], bet, machine)[0]
+            net_points += np.bincount(user_ids, weights=wins - bets, minlength=users + 1).astype(np.int64)
+            loader.insert(
+                CasinoSpinTable.__table__,
+                ("user_id", "bet_amount", "reels", "win_amount", "created_at"),
+                list(zip(
+                    user_ids.tolist(), bets.tolist(), pack_reels_array(reels).tolist(), wins.tolist(),
+                    _timestamps(end, rng.integers(0, history, size)),
+                )),
+            )
+            log(f"casino_spins: {offset + size:,} / {spins:,}")
+        timings["spins"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        streaks, last = _streaks(studied[1:])
+        del studied
+        last_days = [
+            (end.date() - timedelta(days=ago)).isoformat() if ago >= 0 else None
+            for ago in last.tolist()
+        ]
+        points = np.maximum(dist.start_points + STUDY_POINTS * sessions_count[1:] + net_points[1:], dist.start_points)
+        loader.execute(
+            "UPDATE users SET points = {0}, total_study_minutes = {0}, current_streak = {0}, last_study_date = {0} "
+            "WHERE id = {0}",
+            list(zip(points.tolist(), minutes_total[1:].tolist(), streaks.tolist(), last_days, range(1, users + 1))),
+        )
+        timings["users"] += time.perf_counter() - start
+        log(f"users: {users:,}")
+    finally:
+        start = time.perf_counter()
+        _create_indexes(engine, tables)
+        timings["indexes"] = time.perf_counter() - start
+        log(f"indexes rebuilt in {timings['indexes']:.1f}s")
+
+    start = time.perf_counter()
+    with Session(engine) as db, db.begin():
+        crud.backfill_study_rollups(db)
+        crud.rebuild_casino_stats(db, end.date())
+    timings["aggregates"] = time.perf_counter() - start
+    log(f"rollups and casino counters rebuilt in {timings['aggregates']:.1f}s")
+
+    total = sum(timings.values())
+    return {
+        "users": users,
+        "sessions": sessions,
+        "spins": spins,
+        "seed": seed,
+        "end": end.date().isoformat(),
+        "seconds": {name: round(value, 2) for name, value in timings.items()},
+        "rows_per_second": round((users + sessions + spins) / total) if total else 0,
+    }
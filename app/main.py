@@ -2,37 +2,53 @@
 # main.py
 # ==============================
 
+from contextlib import asynccontextmanager
+import asyncio
 from datetime import datetime, timedelta, date
-from pathlib import Path
-import random
-import json
+from typing import NamedTuple, Optional
 import time
 
 # -----------------------------
 # CONFIG
 # -----------------------------
 from config import properties
-from fastapi import (APIRouter, Depends, FastAPI, HTTPException, Request,
+from fastapi import (APIRouter, Depends, FastAPI, Header, HTTPException, Request,
                      Response)
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from fastapi.staticfiles import StaticFiles
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, create_engine, func, text
-from sqlalchemy.orm import Session, declarative_base, sessionmaker
-from starlette.middleware.base import BaseHTTPMiddleware
-
-from .db.database import get_db
+from sqlalchemy import func, insert, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .db import archive, crud, migrations, recompute
+from .db.database import Database, async_engine, database, engine
+from .db.models import (
+    CasinoSpinTable, CasinoUserStatsTable, ReportTable, StudySessionTable, User,
+)
 from .db.schemas import (
     StatsResponse, TokenResponse, UserLogin, UserRegister,
     UserStats, LeaderboardEntry, LeaderboardResponse,
-    CasinoSpinRequest, CasinoSpinResponse, CasinoStatsResponse
+    CasinoSpinRequest, CasinoSpinResponse, CasinoStatsResponse,
+    CasinoBatchSpinRequest, CasinoBatchSpinResponse, CasinoSpinResult,
+    StudyCompleteRequest, StudyCompleteResponse,
+    ActivityEvent, ActivityFeedResponse, CommunityStatsResponse,
+    ReportResponse,
 )
+from .middleware.auth import AuthRequiredMiddleware
 from .middleware.logging import LoggingMiddleware, logger
-
-DB_PATH = properties["path"]["db"] / "app.db"
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+from .middleware.metrics import MetricsMiddleware
+from .services.events import EventBus, sse_stream
+from .services.group_commit import GroupCommitBuffer
+from .services.static import PrecompressedStaticFiles
+from .services.leaderboard import leaderboard_index
+from .services.metrics import metrics
+from .services.passwords import password_hasher
+from .services.response_cache import ResponseCache
+from .services.slots import MACHINES, pack_reels, play, play_batch
+from .services.tokens import TokenVerifier
+from .services.uploads import UploadError, read_form, sniff_image
+from .services.user_cache import CachedUser, UserCache
 
 SECRET_KEY = properties["secret_key"]
 ALGORITHM = "HS256"
@@ -40,114 +56,44 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 FRONT_END = properties["path"]["frontend"] / "dist"
 SECURITY_PAGES = properties["path"]["security_pages"]
+CASINO = properties["casino"]
+MAX_BATCH_SPINS = CASINO["max_batch_spins"]
+STUDY = properties["study"]
+STUDY_POINTS = STUDY["points_per_session"]
+ACTIVITY = properties["activity"]
 
 # -----------------------------
-# DATABASE
-# -----------------------------
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-Base = declarative_base()
-
-
-# -----------------------------
-# TABLES
+# DB
 # -----------------------------
 
 
+def get_database() -> Database:
+    """Session runner for API routes (sync or async, see config)"""
+    return database
 
-class User(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, nullable=False)
-    email = Column(String, unique=True, nullable=False)
-    password_hash = Column(String, nullable=False)
-    points = Column(Integer, default=0)
-    total_study_minutes = Column(Integer, default=0)
-    current_streak = Column(Integer, default=0)
-    last_study_date = Column(String, nullable=True)
-
-
-class StudySessionTable(Base):
-    __tablename__ = "study_sessions"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    duration_minutes = Column(Integer, nullable=False)
-    started_at = Column(DateTime, default=datetime.utcnow)
-    ended_at = Column(DateTime, nullable=True)
-
-
-class CasinoSpinTable(Base):
-    __tablename__ = "casino_spins"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    bet_amount = Column(Integer, nullable=False)
-    result_slots = Column(String, nullable=False)
-    win_amount = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
 
-# -----------------------------
-# DB
-# -----------------------------
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-Base.metadata.create_all(bind=engine)
-
-# Migrate: add new columns to existing users table if missing
-import sqlite3 as _sqlite3
-_conn = _sqlite3.connect(str(DB_PATH))
-_cursor = _conn.cursor()
-_cursor.execute("PRAGMA table_info(users)")
-_existing_cols = {row[1] for row in _cursor.fetchall()}
-for _col, _type, _default in [
-    ("points", "INTEGER", "0"),
-    ("total_study_minutes", "INTEGER", "0"),
-    ("current_streak", "INTEGER", "0"),
-    ("last_study_date", "TEXT", "NULL"),
-]:
-    if _col not in _existing_cols:
-        _cursor.execute(f"ALTER TABLE users ADD COLUMN {_col} {_type} DEFAULT {_default}")
-_conn.commit()
-# Give existing users starting points if they have 0
-_cursor.execute("UPDATE users SET points = 1000 WHERE points = 0 OR points IS NULL")
-_conn.commit()
-_conn.close()
+metrics.instrument_engine(engine)
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine)
 
 # -----------------------------
 # SECURITY (JWT + hashing)
 # -----------------------------
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 security = HTTPBearer()
+token_verifier = TokenVerifier(SECRET_KEY, ALGORITHM, maxsize=properties["auth"]["token_cache_size"])
 
 
-def hash_password(password: str) -> str:
-    """
-    Hashes password
-    """
-    print(len(password))
-    return pwd_context.hash(password)
-
-
-def verify_password(password: str, hashed: str) -> bool:
-    """
-    Verifies password
-    """
-    return pwd_context.verify(password, hashed)
+class CurrentUser(NamedTuple):
+    id: Optional[int]  # None for tokens issued before the `uid` claim
+    username: str
 
 
-def create_access_token(username: str) -> str:
+def create_access_token(username: str, user_id: int) -> str:
     """
     Creates access token (payload hashed by secret key)
     """
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    payload = {"sub": username, "exp": expire}
+    payload = {"sub": username, "uid": user_id, "exp": expire}
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
@@ -157,7 +103,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     """
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_verifier.verify(token)
         return payload["sub"]
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -165,66 +111,284 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
 
 def get_current_user_from_cookie(request: Request):
     """Alternative auth: read JWT from cookie (for SPA API calls)."""
+    return get_current_identity_from_cookie(request).username
+
+
+def get_current_identity_from_cookie(request: Request) -> CurrentUser:
+    """Cookie auth, with the user id carried by the token"""
     token = request.cookies.get("access_token")
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["sub"]
+        payload = token_verifier.verify(token)
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    request.state.user = payload["sub"]  # for request log
+    return CurrentUser(id=payload.get("uid"), username=payload["sub"])
 
 
 # -----------------------------
-# FASTAPI APP
+# USER CACHE
 # -----------------------------
-app = FastAPI(title="Lockin API")
-app.add_middleware(LoggingMiddleware)
+user_cache = UserCache(
+    maxsize=properties["auth"]["user_cache_size"],
+    ttl=properties["auth"]["user_cache_ttl_seconds"],
+)
+
+
+def resolve_user_id(db: Session, current: CurrentUser) -> Optional[int]:
+    """Id from the token, looked up by username for older tokens"""
+    if current.id is not None:
+        return current.id
+    return db.query(User.id).filter_by(username=current.username).scalar()
+
+
+def get_cached_user(db: Session, current: CurrentUser) -> CachedUser:
+    """Hot user fields, from the cache or one primary key lookup (404 if gone)"""
+    def load(user_id: int) -> Optional[CachedUser]:
+        row = db.query(
+            User.id, User.username, User.points,
+            User.total_study_minutes, User.current_streak, User.last_study_date,
+        ).filter_by(id=user_id).first()
+        if row is None:
+            return None
+        return CachedUser(
+            id=row.id,
+            username=row.username,
+            points=row.points or 0,
+            total_study_minutes=row.total_study_minutes or 0,
+            current_streak=row.current_streak or 0,
+            last_study_date=row.last_study_date,
+        )
+
+    user = None
+    if current.id is not None:
+        user = user_cache.get_or_load(current.id, load)
+    elif (user_id := resolve_user_id(db, current)) is not None:
+        user = user_cache.get_or_load(user_id, load)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
 
 # -----------------------------
-# PROTECT SPA MIDDLEWARE
+# RESPONSE CACHE
 # -----------------------------
-class AuthRequiredMiddleware(BaseHTTPMiddleware):
-    """
-    Protects SPA
+CACHE_TTL = properties["response_cache"]["ttl_seconds"]
 
-    If user does not have / have invalid access token:
-        redirect to login page
-    """
-    async def dispatch(self, request: Request, call_next):
-        # Only protect SPA
-        print(request.url)
-        if request.url.path.startswith("/app/index.html"):
-            token = request.cookies.get("access_token")
-            print(token)
-            if not token:
-                return RedirectResponse("/login")
-            try:
-                jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-                print("decoded")
-            except JWTError:
-                return RedirectResponse("/login")
-        return await call_next(request)
+response_cache = ResponseCache(
+    identify=get_current_user_from_cookie,
+    maxsize=properties["response_cache"]["max_entries"],
+)
+
+
+LEADERBOARD_SIZE = 10
+
+
+def update_leaderboard(user_id: int, username: str, minutes: Optional[int]):
+    """Moves the user in the ranked index, drops the shared top 10 if it changed"""
+    before, _ = leaderboard_index.rank(username)
+    leaderboard_index.update(user_id, username, minutes)
+    after, _ = leaderboard_index.rank(username)
+    if 0 < before <= LEADERBOARD_SIZE or 0 < after <= LEADERBOARD_SIZE:
+        response_cache.invalidate("leaderboard")
 
 
-app.add_middleware(AuthRequiredMiddleware)
+# -----------------------------
+# ACTIVITY FEED
+# -----------------------------
+activity_bus = EventBus(history=ACTIVITY["history"], queue_size=ACTIVITY["subscriber_queue"])
+
+
+# -----------------------------
+# LEADERBOARD INDEX
+# -----------------------------
+def _ranked_users(db: Session):
+    return db.query(User.id, User.username, User.total_study_minutes).yield_per(10_000)
+
+
+def load_leaderboard_index(db: Session):
+    """Loads ranked index from users table (one scan per process, on first use)"""
+    leaderboard_index.load_once(lambda: _ranked_users(db))
+
+
+def reload_leaderboard_index(db: Session):
+    """Re-reads the ranked index: picks up writes of other workers and CLI jobs"""
+    leaderboard_index.reload(lambda: _ranked_users(db))
+
+
+_leaderboard_load: Optional[asyncio.Future] = None
+
+
+async def ensure_leaderboard_index():
+    """Loads the index once; concurrent callers share the same load"""
+    global _leaderboard_load
+    if leaderboard_index.loaded:
+        return
+    if _leaderboard_load is None or _leaderboard_load.done():
+        _leaderboard_load = asyncio.ensure_future(database.run(load_leaderboard_index))
+    await asyncio.shield(_leaderboard_load)
+
 
 # -----------------------------
 # SPA
 # -----------------------------
-app.mount("/app", StaticFiles(directory=FRONT_END, html=True), name="frontend")
+STATIC = properties["static"]
+spa = PrecompressedStaticFiles(
+    FRONT_END,
+    memory_max=STATIC["memory_max_bytes"],
+    min_compress=STATIC["min_compress_bytes"],
+    brotli_quality=STATIC["brotli_quality"],
+    gzip_level=STATIC["gzip_level"],
+    immutable_max_age=STATIC["immutable_max_age"],
+)
+
+
+# -----------------------------
+# STARTUP / SHUTDOWN
+# -----------------------------
+def init_schema():
+    """Creates missing tables (fresh database, stamped up to date), warns about pending migrations"""
+    migrations.create_schema(engine)
+    if pending := migrations.pending(engine):
+        logger.warning(
+            "database schema is behind by %s migration(s), run `python -m app.cli migrate`",
+            len(pending),
+        )
+
+
+async def warm_up():
+    """Loads the leaderboard index and static files after startup"""
+    try:
+        await ensure_leaderboard_index()
+        await run_in_threadpool(spa.load_once)
+        logger.info(
+            "warm-up done: %s ranked users, %s static files (%s bytes in memory)",
+            len(leaderboard_index), len(spa.files), spa.memory_bytes(),
+        )
+    except Exception:
+        logger.exception("warm-up failed, loading on first use instead")
+
+
+async def reload_leaderboard_periodically():
+    """Reconciles the leaderboard index with the users table"""
+    while True:
+        await asyncio.sleep(STUDY["leaderboard_reload_seconds"])
+        try:
+            await database.run(reload_leaderboard_index)
+            response_cache.invalidate("leaderboard")
+        except Exception:
+            logger.exception("leaderboard reload failed, retrying next interval")
+
+
+# a claimed run that has not finished after this long is taken over
+JOB_LEASE = timedelta(hours=24)
+
+
+async def run_claimed(name: str, slot: int, job, *args, **kwargs):
+    """Runs `job(*args, **kwargs)` in the threadpool if this worker claims `slot` of `name`, else None"""
+    def claim(db: Session) -> bool:
+        now = datetime.utcnow()
+        claimed = crud.claim_job(db, name, slot, now, now - JOB_LEASE)
+        db.commit()
+        return claimed
+
+    def finish(db: Session):
+        crud.finish_job(db, name, slot, datetime.utcnow())
+        db.commit()
+
+    if not await database.run(claim):
+        return None
+    try:
+        return await run_in_threadpool(job, *args, **kwargs)
+    finally:
+        await database.run(finish)
+
+
+async def archive_spins_periodically():
+    """Moves spins older than the configured window to the archive tables (one worker per interval)"""
+    interval = CASINO["archive_interval_seconds"]
+    while True:
+        # workers wake at the same interval boundary and claim it by its number
+        slot = int(time.time() // interval) + 1
+        await asyncio.sleep(slot * interval - time.time())
+        try:
+            result = await run_claimed("archive_spins", slot, archive.archive_spins, engine, CASINO["archive_after_days"])
+            if result and result["spins"]:
+                logger.info("archived %s spins from %s day(s) before %s",
+                            result["spins"], result["days"], result["before"])
+        except Exception:
+            logger.exception("spin archival failed, retrying next interval")
+
+
+def next_run(at: str, now: datetime) -> datetime:
+    """Next "HH:MM" after `now` """
+    hour, minute = (int(part) for part in at.split(":"))
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= now:
+        run += timedelta(days=1)
+    return run
+
+
+def _progress_updated(rows):
+    for user_id, username, minutes in rows:
+        user_cache.invalidate(user_id)
+        update_leaderboard(user_id, username, minutes)
+
+
+async def recompute_progress_nightly():
+    """Rebuilds study totals and streaks from study_sessions once a day (one worker per day)"""
+    while True:
+        run = next_run(STUDY["recompute_at"], datetime.utcnow())
+        await asyncio.sleep((run - datetime.utcnow()).total_seconds())
+        try:
+            # other workers see the new totals on their next leaderboard reload
+            result = await run_claimed("recompute_progress", run.toordinal(),
+                                       recompute.recompute_progress, engine, on_update=_progress_updated)
+            if result:
+                logger.info("progress recomputed: %s users, %s updated, %s zeroed in %ss",
+                            result["users"], result["updated"], result["zeroed"], result["seconds"])
+        except Exception:
+            logger.exception("progress recompute failed, retrying tomorrow")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup / shutdown hooks
+
+    Startup only checks the schema; everything that grows with the data
+    (leaderboard index, static files) is loaded in the background and by
+    the first request that needs it, whichever comes first
+    """
+    await run_in_threadpool(init_schema)
+    background = [asyncio.create_task(warm_up())]
+    if STUDY["leaderboard_reload_seconds"] > 0:
+        background.append(asyncio.create_task(reload_leaderboard_periodically()))
+    if CASINO["archive_interval_seconds"] > 0:
+        background.append(asyncio.create_task(archive_spins_periodically()))
+    if STUDY["recompute_at"]:
+        background.append(asyncio.create_task(recompute_progress_nightly()))
+    yield
+    for task in background:
+        task.cancel()
+    await study_writer.close()
+    password_hasher.shutdown()
 
 
 # -----------------------------
 # SECURITY PAGES
 # -----------------------------
-@app.get("/login", response_class=FileResponse)
+pages_router = APIRouter()
+
+
+@pages_router.get("/login", response_class=FileResponse)
 async def login_page():
     """Login page"""
     return SECURITY_PAGES / "login.html"
 
 
-@app.get("/register", response_class=FileResponse)
+@pages_router.get("/register", response_class=FileResponse)
 async def register_page():
     """Register page"""
     return SECURITY_PAGES / "register.html"
@@ -233,13 +397,13 @@ async def register_page():
 # -----------------------------
 # ROOT REDIRECT
 # -----------------------------
-@app.get("/")
+@pages_router.get("/")
 async def root(request: Request):
     """Redirects if user does not have / have invalid access token"""
     token = request.cookies.get("access_token")
     if token:
         try:
-            jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            token_verifier.verify(token)
             return RedirectResponse("/app/index.html")
         except JWTError:
             pass
@@ -248,6 +412,51 @@ async def root(request: Request):
 
 
 
+# -----------------------------
+# METRICS
+# -----------------------------
+def _auth_metrics():
+    stats = token_verifier.stats()
+    yield "# HELP lockin_token_cache_hits_total Verified JWT cache hits"
+    yield "# TYPE lockin_token_cache_hits_total counter"
+    yield f"lockin_token_cache_hits_total {stats['hits']}"
+    yield "# HELP lockin_token_cache_misses_total Verified JWT cache misses"
+    yield "# TYPE lockin_token_cache_misses_total counter"
+    yield f"lockin_token_cache_misses_total {stats['misses']}"
+    stats = user_cache.stats()
+    yield "# HELP lockin_user_cache_hits_total User row cache hits"
+    yield "# TYPE lockin_user_cache_hits_total counter"
+    yield f"lockin_user_cache_hits_total {stats['hits']}"
+    yield "# HELP lockin_user_cache_misses_total User row cache misses"
+    yield "# TYPE lockin_user_cache_misses_total counter"
+    yield f"lockin_user_cache_misses_total {stats['misses']}"
+
+
+metrics.add_collector(_auth_metrics)
+
+
+def _response_cache_metrics():
+    stats = response_cache.stats()
+    yield "# HELP lockin_response_cache_hits_total Cached API responses served"
+    yield "# TYPE lockin_response_cache_hits_total counter"
+    yield f"lockin_response_cache_hits_total {stats['hits']}"
+    yield "# HELP lockin_response_cache_misses_total API responses computed for the cache"
+    yield "# TYPE lockin_response_cache_misses_total counter"
+    yield f"lockin_response_cache_misses_total {stats['misses']}"
+    yield "# HELP lockin_response_cache_coalesced_total Requests that waited for a computation in flight"
+    yield "# TYPE lockin_response_cache_coalesced_total counter"
+    yield f"lockin_response_cache_coalesced_total {stats['coalesced']}"
+
+
+metrics.add_collector(_response_cache_metrics)
+
+
+@pages_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # -----------------------------
 # API ROUTES
 # -----------------------------
@@ -255,40 +464,67 @@ api_router = APIRouter(prefix="/api")
 
 
 @api_router.post("/register")
-def register(data: UserRegister, response: Response, db: Session = Depends(get_db)):
+async def register(data: UserRegister, response: Response, db: Database = Depends(get_database)):
     """
     POST register
 
     Validates nickname and register usar"""
-    # check username
-    if db.query(User).filter_by(username=data.username).first():
+    def username_taken(db: Session):
+        return db.query(User.id).filter_by(username=data.username).first() is not None
+
+    def query(db: Session, password_hash: str):
+        # check username (again, it could be taken while hashing)
+        if username_taken(db):
+            raise HTTPException(status_code=400, detail="Username already exists")
+
+        user = User(
+            username=data.username,
+            email=data.email,         # save email
+            password_hash=password_hash,
+            points=1000,              # starting bonus
+        )
+        db.add(user)
+        db.commit()
+        return user.id, user.username, user.total_study_minutes
+
+    # check username before paying for the hash
+    if await db.run(username_taken):
         raise HTTPException(status_code=400, detail="Username already exists")
 
-    user = User(
-        username=data.username,
-        email=data.email,         # save email
-        password_hash=hash_password(data.password),
-        points=1000,              # starting bonus
-    )
-    db.add(user)
-    db.commit()
+    password_hash = await password_hasher.hash(data.password)
+    update_leaderboard(*await db.run(query, password_hash))
+    response_cache.invalidate("community_stats")
 
     return {"message": "Registered successfully"}
 
 
 
 @api_router.post("/login", response_model=TokenResponse)
-def login(data: UserLogin, response: Response, db: Session = Depends(get_db)):
+async def login(data: UserLogin, response: Response, db: Database = Depends(get_database)):
     """
     POST login
 
     Validates credentials and returns access token
     """
-    user = db.query(User).filter_by(username=data.username).first()
-    if not user or not verify_password(data.password, user.password_hash):
+    def query(db: Session):
+        return db.query(User.id, User.username, User.password_hash).filter_by(username=data.username).first()
+
+    def rehash(db: Session, user_id: int, password_hash: str):
+        db.query(User).filter_by(id=user_id).update({User.password_hash: password_hash})
+        db.commit()
+
+    user = await db.run(query)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    valid, new_hash = await password_hasher.verify(data.password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Argon2 parameters changed since this hash was made
+        await db.run(rehash, user.id, new_hash)
 
-    token = create_access_token(user.username)
+    token = create_access_token(user.username, user.id)
 
     response.set_cookie(
         key="access_token",
@@ -314,89 +550,287 @@ def stats(user=Depends(get_current_user)):
 # ---------------------------
 
 @api_router.get("/dashboard/stats", response_model=UserStats)
-def dashboard_stats(request: Request, db: Session = Depends(get_db)):
+async def dashboard_stats(request: Request, db: Database = Depends(get_database)):
     """
     Dashboard stats
 
     Stats of the user
     """
-    user = get_current_user_from_cookie(request)
-    db_user = db.query(User).filter_by(username=user).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    current = get_current_identity_from_cookie(request)
 
-    # Sessions today
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    sessions_today = db.execute(
-        text(f"SELECT COUNT(*) FROM study_sessions WHERE user_id = {db_user.id} AND started_at >= '{today_start.isoformat()}'")
-    ).scalar() or 0
-
-    # Weekly minutes
-    week_start = today_start - timedelta(days=today_start.weekday())
-    weekly_minutes = db.execute(
-        text(f"SELECT COALESCE(SUM(duration_minutes), 0) FROM study_sessions WHERE user_id = {db_user.id} AND started_at >= '{week_start.isoformat()}'")
-    ).scalar() or 0
-
-    return UserStats(
-        username=db_user.username,
-        total_study_minutes=db_user.total_study_minutes or 0,
-        sessions_today=sessions_today,
-        current_streak=db_user.current_streak or 0,
-        points=db_user.points or 0,
-        weekly_minutes=weekly_minutes,
-    )
+    def query(db: Session):
+        user = get_cached_user(db, current)
+
+        # Sessions today / weekly minutes
+        sessions_today, weekly_minutes = crud.get_study_rollup(db, user.id, datetime.utcnow().date())
+
+        return UserStats(
+            username=user.username,
+            total_study_minutes=user.total_study_minutes,
+            sessions_today=sessions_today,
+            current_streak=user.current_streak,
+            points=user.points,
+            weekly_minutes=weekly_minutes,
+        )
+
+    return await db.run(query)
+
+
+async def _leaderboard_top():
+    return [
+        LeaderboardEntry(rank=rank, username=username, total_study_minutes=minutes)
+        for rank, username, minutes in leaderboard_index.top(LEADERBOARD_SIZE)
+    ]
 
 
 @api_router.get("/dashboard/leaderboard", response_model=LeaderboardResponse)
-def dashboard_leaderboard(request: Request, db: Session = Depends(get_db)):
+async def dashboard_leaderboard(request: Request):
     """
     Leaderboard (Top students)
+
+    The top 10 is serialized once and shared by every user (cached for
+    CACHE_TTL["leaderboard"], dropped when a top 10 user studies);
+    my_rank / my_study_minutes are read from the index per request
     """
     user = get_current_user_from_cookie(request)
-    # Get all users sorted by total_study_minutes
-    all_users = db.query(User).order_by(User.total_study_minutes.desc()).all()
-
-    leaderboard = []
-    my_rank = 0
-    my_study_minutes = 0
-
-    for i, u in enumerate(all_users):
-        leaderboard.append(LeaderboardEntry(
-            rank=i + 1,
-            username=u.username,
-            total_study_minutes=u.total_study_minutes or 0,
-        ))
-        if u.username == user:
-            my_rank = i + 1
-            my_study_minutes = u.total_study_minutes or 0
-
-    return LeaderboardResponse(
-        leaderboard=leaderboard[:10],  # top 10
-        my_rank=my_rank,
-        my_study_minutes=my_study_minutes,
+    await ensure_leaderboard_index()
+
+    top = await response_cache.get("leaderboard", CACHE_TTL["leaderboard"], _leaderboard_top)
+    my_rank, my_study_minutes = leaderboard_index.rank(user)
+
+    return response_cache.respond(
+        request,
+        b'{"leaderboard":%s,"my_rank":%d,"my_study_minutes":%d}' % (top.body, my_rank, my_study_minutes),
     )
 
 
 # ---------------------------
-# CASINO API (server-side random)
+# STUDY API
+# ---------------------------
+
+class StudyCompletion(NamedTuple):
+    user_id: Optional[int]
+    username: str
+    duration_minutes: int
+    idempotency_key: Optional[str]
+    ended_at: datetime
+
+
+def next_streak(current_streak: int, last_study_date: Optional[date], today: date) -> int:
+    """Streak after studying today (continues only from yesterday)"""
+    if last_study_date == today:
+        return current_streak or 1
+    if last_study_date == today - timedelta(days=1):
+        return (current_streak or 0) + 1
+    return 1
+
+
+def write_study_completions(db: Session, items):
+    """
+    Writes a batch of study completions in one transaction
+
+    - one bulk insert of study_sessions
+    - one points increment and one counters update per user, from rows
+      read under the write lock (several workers write concurrently)
+    - retries with a known (user, Idempotency-Key) are answered from the
+      stored state instead of being written again
+    Returns (one StudyCompleteResponse or HTTPException per item,
+    activity events to publish)
+    """
+    today = datetime.utcnow().date()
+    crud.begin_write(db)
+    users = {
+        row.username: row
+        for row in db.query(
+            User.id, User.username, User.total_study_minutes, User.current_streak, User.last_study_date,
+        ).filter(or_(
+            User.id.in_({item.user_id for item in items if item.user_id is not None}),
+            User.username.in_({item.username for item in items if item.user_id is None}),
+        )).with_for_update()
+    }
+    keys = {item.idempotency_key for item in items if item.idempotency_key}
+    seen = set()
+    if keys:
+        seen = set(db.query(StudySessionTable.user_id, StudySessionTable.idempotency_key).filter(
+            StudySessionTable.user_id.in_([row.id for row in users.values()]),
+            StudySessionTable.idempotency_key.in_(keys),
+        ).all())
+
+    state = {}     # user_id -> {"award", "added", "minutes", "streak", "last"}
+    sessions = []
+    events = []    # (type, username, value)
+    outcomes = []  # (user_id, award so far for that user, replayed) or exception
+    for item in items:
+        row = users.get(item.username)
+        if row is None:
+            outcomes.append(HTTPException(status_code=404, detail="User not found"))
+            continue
+
+        user_state = state.setdefault(row.id, {
+            "award": 0,
+            "added": 0,
+            "minutes": row.total_study_minutes or 0,
+            "streak": row.current_streak or 0,
+            "last": row.last_study_date,
+        })
+        if item.idempotency_key and (row.id, item.idempotency_key) in seen:
+            outcomes.append((row.id, user_state["award"], user_state["minutes"], user_state["streak"], True))
+            continue
+
+        streak = next_streak(user_state["streak"], user_state["last"], today)
+        events.append(("study_session", row.username, item.duration_minutes))
+        if streak > max(user_state["streak"], 1):
+            events.append(("streak", row.username, streak))
+
+        user_state["award"] += STUDY_POINTS
+        user_state["added"] += item.duration_minutes
+        user_state["minutes"] += item.duration_minutes
+        user_state["streak"] = streak
+        user_state["last"] = today
+        if item.idempotency_key:
+            seen.add((row.id, item.idempotency_key))
+        sessions.append({
+            "user_id": row.id,
+            "duration_minutes": item.duration_minutes,
+            "started_at": item.ended_at - timedelta(minutes=item.duration_minutes),
+            "ended_at": item.ended_at,
+            "idempotency_key": item.idempotency_key,
+        })
+        outcomes.append((row.id, user_state["award"], user_state["minutes"], user_state["streak"], False))
+
+    balances = {}
+    if sessions:
+        db.execute(insert(StudySessionTable), sessions)
+        for session in sessions:
+            crud.add_study_rollup(db, session["user_id"], session["started_at"], session["duration_minutes"])
+
+    for user_id, user_state in state.items():
+        balances[user_id] = crud.apply_points(db, user_id, debit=0, credit=user_state["award"], required=0)
+        db.query(User).filter_by(id=user_id).update({
+            User.total_study_minutes: func.coalesce(User.total_study_minutes, 0) + user_state["added"],
+            User.current_streak: user_state["streak"],
+            User.last_study_date: user_state["last"],
+        }, synchronize_session=False)
+    db.commit()
+    for user_id in state:
+        user_cache.invalidate(user_id)
+
+    usernames = {row.id: row.username for row in users.values()}
+    for user_id, user_state in state.items():
+        update_leaderboard(user_id, usernames[user_id], user_state["minutes"])
+        response_cache.invalidate("casino_stats", usernames[user_id])  # points
+    if sessions:
+        response_cache.invalidate("community_stats")
+
+    results = []
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            results.append(outcome)
+            continue
+        user_id, award, minutes, streak, replayed = outcome
+        user_state = state[user_id]
+        results.append(StudyCompleteResponse(
+            points_awarded=0 if replayed else STUDY_POINTS,
+            # balance right after this item: final balance minus later awards
+            new_balance=balances[user_id] - (user_state["award"] - award),
+            total_study_minutes=minutes,
+            current_streak=streak,
+            replayed=replayed,
+        ))
+    return results, events
+
+
+async def _flush_study_completions(items):
+    results, events = await database.run(write_study_completions, items)
+    for event in events:
+        activity_bus.publish(*event)
+    return results
+
+
+study_writer = GroupCommitBuffer(
+    _flush_study_completions,
+    window=properties["study"]["commit_window_ms"] / 1000,
+    max_batch=properties["study"]["commit_max_batch"],
+)
+
+
+@api_router.post("/study/complete", response_model=StudyCompleteResponse)
+async def study_complete(
+    data: StudyCompleteRequest,
+    request: Request,
+    idempotency_key: Optional[str] = Header(default=None, max_length=64),
+):
+    """
+    POST study session completed
+
+    - Records the session and awards stars
+    - Updates total study minutes, streak and last study date
+    - Retries with the same Idempotency-Key header are not counted twice
+    """
+    current = get_current_identity_from_cookie(request)
+    return await study_writer.submit(StudyCompletion(
+        user_id=current.id,
+        username=current.username,
+        duration_minutes=data.duration_minutes,
+        idempotency_key=idempotency_key,
+        ended_at=datetime.utcnow(),
+    ))
+
+
 # ---------------------------
+# COMMUNITY API
+# ---------------------------
+
+@api_router.get("/community/activity", response_model=ActivityFeedResponse)
+async def community_activity(
+    request: Request,
+    after: Optional[int] = None,
+    last_event_id: Optional[int] = Header(default=None),
+):
+    """
+    Real-time activity feed (jackpots, completed sessions, streaks)
+
+    - `Accept: text/event-stream`: Server-Sent Events, pushed as they
+      happen; reconnecting clients resume from `Last-Event-ID`
+    - otherwise: JSON list of recent events (`?after=<id>` for new ones)
+    Served from memory, no database queries
+    """
+    get_current_user_from_cookie(request)
+    after_id = after if after is not None else last_event_id
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        subscription = activity_bus.subscribe(after_id, replay=ACTIVITY["replay"])
+        return StreamingResponse(
+            sse_stream(activity_bus, subscription, heartbeat=ACTIVITY["heartbeat_seconds"]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return ActivityFeedResponse(
+        events=[ActivityEvent(**event) for event in activity_bus.recent(after_id, limit=ACTIVITY["replay"])],
+    )
 
-SLOT_SYMBOLS = [
-    {"label": "+0.1 Grade", "value": 100},
-    {"label": "Pizza Slice", "value": 80},
-    {"label": "Trophy", "value": 120},
-    {"label": "Star Points", "value": 60},
-    {"label": "Mystery Box", "value": 90},
-    {"label": "Achievement", "value": 110},
-    {"label": "Power Up", "value": 70},
-    {"label": "Extra Life", "value": 85},
-    {"label": "Royal Bonus", "value": 150},
-    {"label": "Jackpot", "value": 200},
-]
 
+@api_router.get("/community/stats", response_model=CommunityStatsResponse)
+@response_cache.cached("community_stats", ttl=CACHE_TTL["community_stats"])
+async def community_stats(request: Request, db: Database = Depends(get_database)):
+    """
+    Community stats (student counts, today's study totals)
+
+    Same response for every user, recomputed at most once per TTL
+    """
+    def query(db: Session):
+        return CommunityStatsResponse(**crud.get_community_stats(db, datetime.utcnow().date()))
+
+    return await db.run(query)
+
+
+# ---------------------------
+# CASINO API (server-side random)
+# ---------------------------
 
 @api_router.post("/casino/spin", response_model=CasinoSpinResponse)
-def casino_spin(data: CasinoSpinRequest, request: Request, db: Session = Depends(get_db)):
+async def casino_spin(data: CasinoSpinRequest, request: Request, db: Database = Depends(get_database)):
     """
     POST casino spin logic
 
@@ -406,119 +840,309 @@ def casino_spin(data: CasinoSpinRequest, request: Request, db: Session = Depends
     """
     start = time.perf_counter()  # track duration
 
-    user = get_current_user_from_cookie(request)
-    db_user = db.query(User).filter_by(username=user).first()
-    if not db_user:
-        duration = time.perf_counter() - start
+    current = get_current_identity_from_cookie(request)
+    user = current.username
+
+    def query(db: Session):
+        user_id = resolve_user_id(db, current)
+        if user_id is None:
+            duration = time.perf_counter() - start
+            client_ip = request.client.host if request.client else "-"
+            logger.info("%s POST /casino/spin %s %.4fs", client_ip, 404, duration)
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # Server generates random result
+        slots, win_amount, is_jackpot, is_double = play(data.bet_amount, MACHINES[data.machine_id])
+
+        # Deduct bet and add winnings in one conditional update
+        new_balance = crud.apply_points(
+            db, user_id, debit=data.bet_amount, credit=win_amount, required=data.bet_amount,
+        )
+        if new_balance is None:
+            db.rollback()
+            if db.get(User, user_id) is None:  # id from a token of a removed user
+                raise HTTPException(status_code=404, detail="User not found")
+            duration = time.perf_counter() - start
+            client_ip = request.client.host if request.client else "-"
+            logger.info("%s/%s casino spin %.4fs %s NOT ENOUGH POINTS", client_ip, user, 400, duration)
+            raise HTTPException(status_code=400, detail="Not enough points")
+
+        # Save spin record
+        now = datetime.utcnow()
+        db.execute(insert(CasinoSpinTable).values(
+            user_id=user_id,
+            bet_amount=data.bet_amount,
+            reels=pack_reels(slots),
+            win_amount=win_amount,
+            created_at=now,
+        ))
+        crud.add_casino_stats(
+            db, user_id, now.date(),
+            spins=1, wins=int(win_amount > 0), winnings=win_amount,
+        )
+        db.commit()
+        user_cache.invalidate(user_id)
+        response_cache.invalidate("casino_stats", user)
+
+        # per-spin detail at debug level (off by default), the access log samples requests
         client_ip = request.client.host if request.client else "-"
-        logger.info("%s POST /casino/spin %s %.4fs", client_ip, 404, duration)
-        raise HTTPException(status_code=404, detail="User not found")
 
-    if (db_user.points or 0) < data.bet_amount:
-        duration = time.perf_counter() - start
+        logger.debug("%s/%s spin[%s, %s, %s] win: %s, balance: %s -> %s",
+                     client_ip, user,
+                     *slots,
+                     win_amount,
+                     new_balance + data.bet_amount - win_amount,
+                     new_balance,
+                     )
+
+        return CasinoSpinResponse(
+            slots=slots,
+            win_amount=win_amount,
+            is_jackpot=is_jackpot,
+            is_double=is_double,
+            new_balance=new_balance,
+        )
+
+    response = await db.run(query)
+    if response.is_jackpot:
+        activity_bus.publish("jackpot", user, response.win_amount)
+    return response
+
+
+
+@api_router.post("/casino/spin/batch", response_model=CasinoBatchSpinResponse)
+async def casino_spin_batch(data: CasinoBatchSpinRequest, request: Request, db: Database = Depends(get_database)):
+    """
+    POST several casino spins at once
+
+    - Plays up to `count` spins (capped by config), stops when points run out
+    - All reels are generated and evaluated in bulk
+    - One bulk insert and one commit for the whole batch
+    """
+    if data.count > MAX_BATCH_SPINS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SPINS} spins per batch")
+
+    current = get_current_identity_from_cookie(request)
+    user = current.username
+
+    def query(db: Session):
+        user_id = resolve_user_id(db, current)
+        if user_id is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # Balance may change between read and update (other spins),
+        # then the conditional update fails and the batch is replayed
+        for _ in range(3):
+            points_before = db.query(User.points).filter_by(id=user_id).one_or_none()
+            if points_before is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            points_before = points_before.points or 0
+            if points_before < data.bet_amount:
+                raise HTTPException(status_code=400, detail="Not enough points")
+
+            results = play_batch(data.count, data.bet_amount, points_before, MACHINES[data.machine_id])
+            total_bet = data.bet_amount * len(results)
+            total_win = sum(result.win_amount for result in results)
+
+            # smallest starting balance that covers every bet of the batch
+            required, running = data.bet_amount, 0
+            for result in results:
+                required = max(required, data.bet_amount - running)
+                running += result.win_amount - data.bet_amount
+
+            new_balance = crud.apply_points(db, user_id, debit=total_bet, credit=total_win, required=required)
+            if new_balance is not None:
+                break
+            db.rollback()
+        else:
+            raise HTTPException(status_code=409, detail="Balance changed, try again")
+
+        # Save spin records
+        now = datetime.utcnow()
+        db.execute(insert(CasinoSpinTable), [
+            {
+                "user_id": user_id,
+                "bet_amount": data.bet_amount,
+                "reels": pack_reels(result.slots),
+                "win_amount": result.win_amount,
+                "created_at": now,
+            }
+            for result in results
+        ])
+        crud.add_casino_stats(
+            db, user_id, now.date(),
+            spins=len(results),
+            wins=sum(1 for result in results if result.win_amount > 0),
+            winnings=total_win,
+        )
+        db.commit()
+        user_cache.invalidate(user_id)
+        response_cache.invalidate("casino_stats", user)
+
         client_ip = request.client.host if request.client else "-"
-        logger.info("%s/%s casino spin %.4fs %s NOT ENOUGH POINTS", client_ip, db_user.username, 400, duration)
-        raise HTTPException(status_code=400, detail="Not enough points")
-
-    # Deduct bet
-    points_before = db_user.points
-    db_user.points = (db_user.points or 0) - data.bet_amount
-
-    # Server generates random result
-    slot0 = random.randint(0, len(SLOT_SYMBOLS) - 1)
-    slot1 = random.randint(0, len(SLOT_SYMBOLS) - 1)
-    slot2 = random.randint(0, len(SLOT_SYMBOLS) - 1)
-    slots = [slot0, slot1, slot2]
-
-    win_amount = 0
-    is_jackpot = False
-    is_double = False
-
-    if slot0 == slot1 == slot2:
-        is_jackpot = True
-        win_amount = SLOT_SYMBOLS[slot0]["value"] * 3
-    elif slot0 == slot1 or slot1 == slot2 or slot0 == slot2:
-        is_double = True
-        win_amount = int(data.bet_amount * 1.5)
-
-    # Add winnings
-    db_user.points += win_amount
-
-    # Save spin record
-    spin_record = CasinoSpinTable(
-        user_id=db_user.id,
-        bet_amount=data.bet_amount,
-        result_slots=json.dumps(slots),
-        win_amount=win_amount,
-    )
-    db.add(spin_record)
-    db.commit()
-    db.refresh(db_user)
-
-    # Log the successful response
-    duration = time.perf_counter() - start
-    client_ip = request.client.host if request.client else "-"
-
-    logger.info("%s/%s spin[%s, %s, %s] win: %s, balance: %s -> %s",
-                client_ip, db_user.username,
-                *(value for value in slots),
-                win_amount,
-                points_before,
-                db_user.points or 0,
-                )
-
-    return CasinoSpinResponse(
-        slots=slots,
-        win_amount=win_amount,
-        is_jackpot=is_jackpot,
-        is_double=is_double,
-        new_balance=db_user.points or 0,
-    )
+        logger.info("%s/%s batch spin x%s win: %s, balance: %s -> %s",
+                    client_ip, user, len(results),
+                    total_win, new_balance + total_bet - total_win, new_balance)
 
+        return CasinoBatchSpinResponse(
+            spins=[CasinoSpinResult(**result._asdict()) for result in results],
+            total_bet=total_bet,
+            total_win=total_win,
+            new_balance=new_balance,
+        )
+
+    response = await db.run(query)
+    for result in response.spins:
+        if result.is_jackpot:
+            activity_bus.publish("jackpot", user, result.win_amount)
+    return response
 
 
 @api_router.get("/casino/stats", response_model=CasinoStatsResponse)
-def casino_stats(request: Request, db: Session = Depends(get_db)):
+@response_cache.cached("casino_stats", ttl=CACHE_TTL["casino_stats"], per_user=True)
+async def casino_stats(request: Request, db: Database = Depends(get_database)):
     """
     POST casino stats logic
 
     - Updates db (wins, winrate, spin today, total winnings)
+    - cached per user, invalidated by the user's spins and study points
 
     """
-    user = get_current_user_from_cookie(request)
-    db_user = db.query(User).filter_by(username=user).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    current = get_current_identity_from_cookie(request)
 
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    def query(db: Session):
+        user = get_cached_user(db, current)
 
-    # Spins today
-    spins_today = db.execute(
-        text(f"SELECT COUNT(*) FROM casino_spins WHERE user_id = {db_user.id} AND created_at >= '{today_start.isoformat()}'")
-    ).scalar() or 0
+        counters = db.get(CasinoUserStatsTable, user.id)
+        total_spins = counters.total_spins if counters else 0
+        wins = counters.wins if counters else 0
+        total_winnings = counters.total_winnings if counters else 0
+        spins_today = (
+            counters.spins_on_day
+            if counters and counters.spin_day == datetime.utcnow().date()
+            else 0
+        )
 
-    # Total winnings
-    total_winnings = db.execute(
-        text(f"SELECT COALESCE(SUM(win_amount), 0) FROM casino_spins WHERE user_id = {db_user.id}")
-    ).scalar() or 0
+        win_rate = (wins / total_spins * 100) if total_spins > 0 else 0.0
 
-    # Win rate
-    total_spins = db.execute(
-        text(f"SELECT COUNT(*) FROM casino_spins WHERE user_id = {db_user.id}")
-    ).scalar() or 0
+        return CasinoStatsResponse(
+            total_points=user.points,
+            total_winnings=total_winnings,
+            spins_today=spins_today,
+            win_rate=round(win_rate, 1),
+        )
 
-    wins = db.execute(
-        text(f"SELECT COUNT(*) FROM casino_spins WHERE user_id = {db_user.id} AND win_amount > 0")
-    ).scalar() or 0
+    return await db.run(query)
 
-    win_rate = (wins / total_spins * 100) if total_spins > 0 else 0.0
 
-    return CasinoStatsResponse(
-        total_points=db_user.points or 0,
-        total_winnings=total_winnings,
-        spins_today=spins_today,
-        win_rate=round(win_rate, 1),
-    )
+# -----------------------------
+# REPORTS
+# -----------------------------
+REPORTS = properties["reports"]
+REPORTS_DIR = properties["path"]["reports"]
+IMAGE_SUFFIXES = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+@api_router.post("/report", response_model=ReportResponse, status_code=201)
+async def submit_report(request: Request, db: Database = Depends(get_database)):
+    """
+    POST violation report
+
+    - form fields: student_name, violation_type, description, optional
+      image (multipart; jpeg / png / gif / webp, checked by content)
+    - the body is streamed: the image goes to disk chunk by chunk and
+      the upload stops with 413 as soon as a limit is crossed
+    - the report number is the id of the reports row; the image is
+      moved to reports/<number>/proof.<ext> in the same transaction
+    """
+    current = get_current_identity_from_cookie(request)
+    incoming = REPORTS_DIR / ".incoming"
+    await run_in_threadpool(incoming.mkdir, parents=True, exist_ok=True)
+    try:
+        form = await read_form(
+            request, incoming, file_field="image",
+            max_file_bytes=REPORTS["max_image_bytes"], max_field_bytes=REPORTS["max_field_bytes"],
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    try:
+        student_name = form.fields.get("student_name", "").strip()
+        violation_type = form.fields.get("violation_type", "").strip()
+        if not student_name:
+            raise HTTPException(status_code=422, detail="student_name is required")
+        if violation_type not in REPORTS["violation_types"]:
+            raise HTTPException(
+                status_code=422,
+                detail=f"violation_type must be one of: {', '.join(REPORTS['violation_types'])}",
+            )
+        image_type = None
+        if form.file is not None:
+            image_type = await run_in_threadpool(sniff_image, form.file.path)
+            if image_type is None:
+                raise HTTPException(status_code=415, detail="Proof must be a JPEG, PNG, GIF or WebP image")
+
+        def query(db: Session):
+            user_id = resolve_user_id(db, current)
+            if user_id is None:
+                raise HTTPException(status_code=404, detail="User not found")
+
+            report = ReportTable(
+                reporter_id=user_id,
+                student_name=student_name,
+                violation_type=violation_type,
+                description=form.fields.get("description", "").strip(),
+                created_at=datetime.utcnow(),
+            )
+            db.add(report)
+            db.flush()  # assigns the report number
+
+            target = None
+            if form.file is not None:
+                relative = f"{report.id}/proof{IMAGE_SUFFIXES[image_type]}"
+                target = REPORTS_DIR / relative
+                target.parent.mkdir(exist_ok=True)
+                form.file.path.replace(target)
+                report.image_path = relative
+                report.image_type = image_type
+                report.image_size = form.file.size
+            try:
+                db.commit()
+            except Exception:
+                if target is not None:
+                    target.unlink(missing_ok=True)
+                raise
+
+            logger.info("%s report #%s (%s, image: %s bytes)",
+                        current.username, report.id, violation_type, report.image_size or 0)
+            return ReportResponse(report_number=report.id, image=report.image_path, created_at=report.created_at)
+
+        return await db.run(query)
+    finally:
+        if form.file is not None:
+            form.file.path.unlink(missing_ok=True)
+
+
+# -----------------------------
+# FASTAPI APP
+# -----------------------------
+def create_app() -> FastAPI:
+    """
+    Application factory
+
+    Only wires routes and middleware: no database, file or process pool
+    work happens until startup / first use
+    """
+    app = FastAPI(title="Lockin API", lifespan=lifespan)
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+    app.add_middleware(LoggingMiddleware)
+    # protect SPA
+    app.add_middleware(AuthRequiredMiddleware, verifier=token_verifier)
+
+    app.mount("/app", spa, name="frontend")
+    app.include_router(pages_router)
+    app.include_router(api_router)
+    return app
 
 
-app.include_router(api_router)
+app = create_app()
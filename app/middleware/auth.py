@@ -0,0 +1,52 @@
+from jose import JWTError
+from starlette.requests import cookie_parser
+from starlette.responses import RedirectResponse
+
+from .logging import logger
+
+
+class AuthRequiredMiddleware:
+    """
+    Protects SPA
+
+    If user does not have / have invalid access token:
+        redirect to login page
+
+    Plain ASGI middleware: every other request is passed through without
+    building a Request object or wrapping the response stream
+    """
+    def __init__(self, app, verifier, protected_prefix: str = "/app/index.html",
+                 login_url: str = "/login"):
+        self.app = app
+        self.verifier = verifier
+        self.protected_prefix = protected_prefix
+        self.login_url = login_url
+
+    async def __call__(self, scope, receive, send):
+        # Only protect SPA
+        if scope["type"] != "http" or not scope["path"].startswith(self.protected_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        token = self._cookie_token(scope)
+        if not token:
+            logger.debug("auth guard %s: no token, redirect", scope["path"])
+            await RedirectResponse(self.login_url)(scope, receive, send)
+            return
+
+        try:
+            self.verifier.verify(token)
+        except JWTError:
+            logger.debug("auth guard %s: invalid token, redirect", scope["path"])
+            await RedirectResponse(self.login_url)(scope, receive, send)
+            return
+
+        logger.debug("auth guard %s: ok", scope["path"])
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _cookie_token(scope):
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                return cookie_parser(value.decode("latin-1")).get("access_token")
+        return None
@@ -1,26 +1,123 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import properties
+
+LOGGING = properties["logging"]
+
+
+# ---------------------------
+# FORMATTERS
+# ---------------------------
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, request fields are added when present"""
+    FIELDS = ("request_id", "user", "ip", "method", "path", "status", "duration_ms")
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(",", ":"))
+
+
+# ---------------------------
+# BACKGROUND WRITER
+# ---------------------------
+
+class BatchRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that does not flush after every record
+
+    Tracks the file size itself (no seek/tell per record), the listener
+    flushes once the queue is drained, so a burst becomes one write
+    """
+    def __init__(self, filename, max_bytes, backup_count, buffer_size=64 * 1024):
+        self.buffer_size = buffer_size
+        self._size = 0
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count,
+                         encoding="utf-8", delay=True)
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, encoding=self.encoding, buffering=self.buffer_size)
+        self._size = stream.tell()
+        return stream
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes and self._size and self._size + len(msg) > self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(msg)
+            self._size += len(msg)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchQueueListener(QueueListener):
+    """Flushes handlers whenever the queue runs empty"""
+    def dequeue(self, block):
+        if block and self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+        return self.queue.get(block)
+
+
+def _make_formatter():
+    if LOGGING["format"] == "json":
+        return JsonFormatter()
+    # log format
+    return logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+
 
 logger = logging.getLogger("lockin")
 logger.setLevel(logging.INFO)
 
-handler = logging.FileHandler("app.log")
-# log format
-formatter = logging.Formatter(
-    "%(asctime)s %(levelname)s %(message)s"
+handler = BatchRotatingFileHandler(
+    LOGGING["file"],
+    max_bytes=LOGGING["max_bytes"],
+    backup_count=LOGGING["backup_count"],
 )
-handler.setFormatter(formatter)
+handler.setFormatter(_make_formatter())
+
+log_queue = queue.SimpleQueue()
+listener = BatchQueueListener(log_queue, handler, respect_handler_level=True)
 
 if not logger.handlers:
-    logger.addHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
 
 
 class LoggingMiddleware:
     """
     Middleware to log
+
+    - every request gets an id (`x-request-id` header is reused or set)
+    - successful responses are sampled with `sample_rate`, errors are always logged
+    - user is taken from `request.state.user` when the route set it
     """
-    def __init__(self, app):
+    def __init__(self, app, sample_rate: float = LOGGING["sample_rate"]):
         self.app = app
+        self.sample_rate = sample_rate
 
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
@@ -29,25 +126,46 @@ class LoggingMiddleware:
 
         start = time.perf_counter()
 
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+
         async def send_wrapper(message):
             if message["type"] == "http.response.start":
                 duration = time.perf_counter() - start
-
-                method = scope.get("method")
-                path = scope.get("path")
                 status = message.get("status")
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+
+                if status >= 400 or self.sample_rate >= 1 or random.random() < self.sample_rate:
+                    method = scope.get("method")
+                    path = scope.get("path")
+
+                    client = scope.get("client")
+                    ip = client[0] if client else "-"
 
-                client = scope.get("client")
-                ip = client[0] if client else "-"
-
-                logger.info(
-                    "%s %s %s %s %.4fs",
-                    ip,
-                    method,
-                    path,
-                    status,
-                    duration,
-                )
+                    logger.info(
+                        "%s %s %s %s %.4fs",
+                        ip,
+                        method,
+                        path,
+                        status,
+                        duration,
+                        extra={
+                            "request_id": request_id,
+                            "user": state.get("user"),
+                            "ip": ip,
+                            "method": method,
+                            "path": path,
+                            "status": status,
+                            "duration_ms": round(duration * 1000, 3),
+                        },
+                    )
 
             await send(message)
 
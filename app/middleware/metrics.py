@@ -0,0 +1,46 @@
+import time
+
+
+class MetricsMiddleware:
+    """
+    Middleware to collect per-route metrics
+
+    Route is the matched template (`/api/casino/spin`) or, for mounted
+    apps such as the static SPA, the mount path (`/app`), so path
+    parameters and unknown URLs do not create new series
+    """
+    def __init__(self, app, registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        root_path = scope.get("root_path", "")
+        stats = self.registry.request_started()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or _mount_path(scope, root_path) or "unmatched"
+            self.registry.request_finished(
+                scope["method"], route, status, time.perf_counter() - start, stats,
+            )
+
+
+def _mount_path(scope, root_path: str):
+    """Path of the matched Mount: the router extends root_path by it"""
+    mounted = scope.get("root_path", "")
+    if len(mounted) > len(root_path) and mounted.startswith(root_path):
+        return mounted[len(root_path):]
+    return None
@@ -0,0 +1,100 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+
+# ---------------------------
+# IN-PROCESS EVENT BUS
+# ---------------------------
+
+class Subscription:
+    """One listener: bounded queue of events not yet delivered"""
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        event = await self.queue.get()
+        if event is None:  # dropped for being too slow
+            raise StopAsyncIteration
+        return event
+
+
+class EventBus:
+    """
+    Fan-out of activity events (jackpots, study sessions, streaks)
+
+    - recent events are kept in a ring buffer, late joiners get a replay
+    - every subscriber has a bounded queue; one that falls behind is
+      dropped instead of slowing down publishers (clients reconnect with
+      Last-Event-ID and are replayed what they missed)
+    Must be used from the event loop thread.
+    """
+    def __init__(self, history: int = 200, queue_size: int = 100):
+        self.history = deque(maxlen=history)
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self._ids = itertools.count(1)
+
+    def publish(self, type: str, username: str, value: int = 0) -> dict:
+        event = {
+            "id": next(self._ids),
+            "type": type,
+            "username": username,
+            "value": value,
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        self.history.append(event)
+        for subscription in list(self.subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+        return event
+
+    def recent(self, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[dict]:
+        """Buffered events, oldest first"""
+        events = [event for event in self.history if after_id is None or event["id"] > after_id]
+        return events[-limit:] if limit else events
+
+    def subscribe(self, after_id: Optional[int] = None, replay: int = 20) -> Subscription:
+        """New subscription, pre-filled with missed (or the latest) events"""
+        subscription = Subscription(self.queue_size)
+        for event in self.recent(after_id, limit=None if after_id is not None else replay)[-self.queue_size:]:
+            subscription.queue.put_nowait(event)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def _drop(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        subscription.dropped = True
+        # make room for the sentinel, the client will resume from Last-Event-ID
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+
+async def sse_stream(bus: EventBus, subscription: Subscription, heartbeat: float) -> AsyncIterator[str]:
+    """Server-Sent Events framing, with comment heartbeats to keep proxies open"""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.__anext__(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            except StopAsyncIteration:
+                return
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        bus.unsubscribe(subscription)
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List
+
+
+class GroupCommitBuffer:
+    """
+    Coalesces concurrent writes into short batches
+
+    Callers `await submit(item)`; items arriving within `window` seconds
+    (or until `max_batch` items are queued) are handed to `flush` as one
+    list, which is expected to write them in a single transaction and
+    return one result per item. A returned exception is raised to that
+    item's caller only; if `flush` itself fails, or returns the wrong
+    number of results, every caller in the batch gets the error. One batch is in flight at a time, new items
+    queue up for the next one meanwhile.
+    """
+    def __init__(self, flush: Callable[[List[Any]], Awaitable[List[Any]]],
+                 window: float = 0.005, max_batch: int = 500):
+        self._flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []  # (item, future)
+        self._task = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return await future
+
+    async def _run(self):
+        while self._pending:
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.window)
+
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+
+            try:
+                results = list(await self._flush([item for item, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"flush returned {len(results)} results for {len(batch)} items")
+            except Exception as exc:
+                results = [exc] * len(batch)
+
+            for (_, future), result in zip(batch, results):
+                if future.done():  # caller went away
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def close(self):
+        """Waits until everything submitted so far is written"""
+        if self._task is not None:
+            await self._task
@@ -0,0 +1,119 @@
+from bisect import bisect_left, insort
+from threading import Lock
+from typing import Callable, Iterable, List, Optional, Tuple
+
+
+# ---------------------------
+# RANKED LEADERBOARD INDEX
+# ---------------------------
+
+class LeaderboardIndex:
+    """
+    Process-wide ranked index of users by total study minutes
+
+    Keeps a sorted list of (-minutes, user_id) keys, so the order matches
+    `ORDER BY total_study_minutes DESC` with ties broken by user id.
+    Rank and top-N lookups are binary searches / slices and never touch
+    the users table.
+    Loaded on first use; updates made before (or during) the load are
+    kept aside and applied on top of the loaded rows. Other processes
+    (workers, CLI jobs) write the same table, so the app calls `reload`
+    periodically to reconcile with it.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self._keys: List[Tuple[int, int]] = []
+        self._users = {}    # user_id -> (username, minutes)
+        self._ids = {}      # username -> user_id
+        self._pending = {}  # user_id -> (username, minutes), updates while not loaded / reloading
+        self._reloading = False
+        self.loaded = False
+
+    def load(self, rows: Iterable[Tuple[int, str, Optional[int]]]):
+        """Replaces the index with (user_id, username, total_study_minutes) rows"""
+        users = {}
+        for user_id, username, minutes in rows:
+            users[user_id] = (username, minutes or 0)
+
+        with self._lock:
+            users.update(self._pending)
+            self._pending = {}
+            self._reloading = False
+            self._users = users
+            self._ids = {username: user_id for user_id, (username, _) in users.items()}
+            self._keys = sorted((-minutes, user_id) for user_id, (_, minutes) in users.items())
+            self.loaded = True
+
+    def load_once(self, fetch: Callable[[], Iterable[Tuple[int, str, Optional[int]]]]):
+        """Loads `fetch()` rows unless already loaded (concurrent callers wait)"""
+        with self._load_lock:
+            if not self.loaded:
+                self.load(fetch())
+
+    def reload(self, fetch: Callable[[], Iterable[Tuple[int, str, Optional[int]]]]):
+        """Replaces the index with `fetch()` rows, keeping updates made while they are read"""
+        with self._load_lock:
+            with self._lock:
+                self._reloading = True
+            try:
+                self.load(fetch())
+            except BaseException:
+                with self._lock:
+                    self._reloading = False
+                    if self.loaded:  # updates were applied as well
+                        self._pending = {}
+                raise
+
+    def update(self, user_id: int, username: str, minutes: Optional[int]):
+        """Inserts the user or moves them to the position of their new total"""
+        minutes = minutes or 0
+        with self._lock:
+            if not self.loaded or self._reloading:
+                self._pending[user_id] = (username, minutes)
+            if not self.loaded:
+                return
+            current = self._users.get(user_id)
+            if current is not None:
+                old_username, old_minutes = current
+                if old_minutes == minutes and old_username == username:
+                    return
+                del self._keys[bisect_left(self._keys, (-old_minutes, user_id))]
+                self._ids.pop(old_username, None)
+            insort(self._keys, (-minutes, user_id))
+            self._users[user_id] = (username, minutes)
+            self._ids[username] = user_id
+
+    def remove(self, user_id: int):
+        """Drops user from the index"""
+        with self._lock:
+            self._pending.pop(user_id, None)
+            current = self._users.pop(user_id, None)
+            if current is None:
+                return
+            username, minutes = current
+            del self._keys[bisect_left(self._keys, (-minutes, user_id))]
+            self._ids.pop(username, None)
+
+    def top(self, n: int) -> List[Tuple[int, str, int]]:
+        """Returns [(rank, username, minutes)] of the first n users"""
+        with self._lock:
+            return [
+                (i + 1, self._users[user_id][0], -neg_minutes)
+                for i, (neg_minutes, user_id) in enumerate(self._keys[:n])
+            ]
+
+    def rank(self, username: str) -> Tuple[int, int]:
+        """Returns (rank, minutes) of the user, (0, 0) if not ranked"""
+        with self._lock:
+            user_id = self._ids.get(username)
+            if user_id is None:
+                return 0, 0
+            minutes = self._users[user_id][1]
+            return bisect_left(self._keys, (-minutes, user_id)) + 1, minutes
+
+    def __len__(self):
+        return len(self._keys)
+
+
+leaderboard_index = LeaderboardIndex()
@@ -0,0 +1,179 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# ---------------------------
+# METRIC TYPES
+# ---------------------------
+
+def _labels(names: Tuple[str, ...], values: Tuple) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+def _series(name: str, labels: str) -> str:
+    return f"{name}{{{labels}}}" if labels else name
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.values.items()):
+            yield f"{_series(self.name, _labels(self.labels, labels))} {value}"
+
+
+class Gauge(Counter):
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in sorted(self.values.items()):
+            yield f"{_series(self.name, _labels(self.labels, labels))} {value}"
+
+
+class Histogram:
+    """Fixed-bucket histogram, observe() is a bisect and three additions"""
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = tuple(buckets)
+        self.values: Dict[Tuple, List] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.values.items()):
+            labels = _labels(self.labels, labels)
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}'
+            yield f"{_series(self.name + '_sum', labels)} {series[-2]}"
+            yield f"{_series(self.name + '_count', labels)} {series[-1]}"
+
+
+# ---------------------------
+# REGISTRY
+# ---------------------------
+
+class RequestDBStats:
+    """Queries issued while serving one request"""
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+
+class MetricsRegistry:
+    """
+    In-process metrics, rendered in Prometheus text format on scrape
+
+    Recording only touches dicts under a lock; nothing is formatted
+    until /metrics is requested
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = Counter(
+            "lockin_http_requests_total", "HTTP requests by route template and status",
+            ("method", "route", "status"),
+        )
+        self.latency = Histogram(
+            "lockin_http_request_duration_seconds", "HTTP request latency",
+            ("method", "route"),
+        )
+        self.in_flight = Gauge("lockin_http_requests_in_flight", "HTTP requests being served")
+        self.db_queries = Histogram(
+            "lockin_db_queries_per_request", "SQL statements executed per request",
+            ("route",), buckets=QUERY_COUNT_BUCKETS,
+        )
+        self.db_time = Histogram(
+            "lockin_db_time_per_request_seconds", "Time spent in SQL per request",
+            ("route",),
+        )
+        self.db_total = Counter("lockin_db_queries_total", "SQL statements executed")
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def request_started(self) -> RequestDBStats:
+        stats = RequestDBStats()
+        _request_db_stats.set(stats)
+        with self._lock:
+            self.in_flight.inc()
+        return stats
+
+    def request_finished(self, method: str, route: str, status: int, duration: float, stats: RequestDBStats):
+        with self._lock:
+            self.in_flight.dec()
+            self.requests.inc(method, route, status)
+            self.latency.observe(duration, method, route)
+            self.db_queries.observe(stats.queries, route)
+            self.db_time.observe(stats.seconds, route)
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]):
+        """Registers callable returning extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                *self.requests.render(), *self.latency.render(), *self.in_flight.render(),
+                *self.db_queries.render(), *self.db_time.render(), *self.db_total.render(),
+            ]
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+    def instrument_engine(self, engine):
+        """Counts and times SQL statements through engine events"""
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_start"].pop()
+            with self._lock:
+                self.db_total.inc()
+            stats = _request_db_stats.get()
+            if stats is not None:
+                stats.queries += 1
+                stats.seconds += elapsed
+
+        @event.listens_for(engine, "handle_error")
+        def _error(context):
+            if context.connection is not None and context.connection.info.get("query_start"):
+                context.connection.info["query_start"].pop()
+
+
+metrics = MetricsRegistry()
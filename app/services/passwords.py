@@ -0,0 +1,117 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from config import properties
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+PASSWORDS = properties["passwords"]
+
+
+# ---------------------------
+# ARGON2 CONTEXT
+# ---------------------------
+
+def make_context(argon2: dict) -> CryptContext:
+    """Argon2 context, hashes made with other parameters are marked for rehash"""
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        **{f"argon2__{name}": value for name, value in argon2.items()},
+    )
+
+
+pwd_context: Optional[CryptContext] = None  # built on first use (worker or threadpool)
+
+
+def _init_worker(argon2: dict):
+    global pwd_context
+    pwd_context = make_context(argon2)
+
+
+def _context() -> CryptContext:
+    global pwd_context
+    if pwd_context is None:
+        pwd_context = make_context(PASSWORDS["argon2"])
+    return pwd_context
+
+
+def _hash(password: str) -> str:
+    return _context().hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _context().verify_and_update(password, hashed)
+
+
+# ---------------------------
+# BOUNDED PROCESS POOL
+# ---------------------------
+
+class PasswordHasher:
+    """
+    Runs Argon2 in a dedicated process pool
+
+    At most `max_queue` jobs may be pending, extra requests get 503 right
+    away instead of queueing behind a login burst. With `workers == 0`
+    hashing runs in the threadpool (tests, single core boxes).
+    """
+    def __init__(self, workers: int, max_queue: int, argon2: dict):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.argon2 = argon2
+        self.pending = 0
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.argon2,),
+            )
+        return self._pool
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_queue:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, try again",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            if self.workers == 0:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hashes password"""
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verifies password
+
+        Returns (valid, new hash); new hash is set when the stored one
+        was made with outdated Argon2 parameters
+        """
+        return await self._submit(_verify_and_update, password, hashed)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORDS["workers"],
+    max_queue=PASSWORDS["max_queue"],
+    argon2=PASSWORDS["argon2"],
+)
@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .static import etag_matches
+
+
+# ---------------------------
+# SHARED RESPONSE CACHE
+# ---------------------------
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    expires: float
+
+
+class ResponseCache:
+    """
+    Serialized JSON responses of read-mostly routes (per-process TTL + LRU)
+
+    - routes opt in with `@response_cache.cached(name, ttl)`, below the
+      router decorator; they must take `request: Request`
+    - `identify(request)` runs on every request, hits included (auth),
+      and its result is part of the key for `per_user` routes
+    - routes with a per-user part share the rest through `get` and
+      answer with `respond`
+    - concurrent misses of one key share a single computation
+    - strong ETag over the body, `If-None-Match` is answered with 304
+    - writes call `invalidate(name)` for everyone or
+      `invalidate(name, user)` for one user's entries; a computation that
+      started before the invalidation is returned but not stored
+    `invalidate` is thread-safe (writes run in the DB threadpool).
+    """
+    def __init__(self, identify: Callable[[Request], Hashable], maxsize: int = 10_000):
+        self.identify = identify
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = Lock()
+        self._cache = OrderedDict()  # key -> CachedResponse
+        self._versions = {}          # name / (name, user) -> invalidation count
+        self._keys = {}              # name / (name, user) -> cached keys
+        self._inflight = {}          # (key, version) -> asyncio.Task, event loop only
+
+    def cached(self, name: str, ttl: float, per_user: bool = False):
+        """Caches the handler's response under (name, path, query[, user])"""
+        def decorator(handler):
+            @functools.wraps(handler)
+            async def wrapper(*args, **kwargs):
+                request: Request = kwargs["request"]
+                user = self.identify(request)
+                key = (name, (request.url.path, request.url.query), user if per_user else None)
+                entry = await self._get(key, ttl, lambda: handler(*args, **kwargs))
+                return self.respond(request, entry.body, entry.etag)
+            return wrapper
+        return decorator
+
+    async def get(self, name: str, ttl: float, compute: Callable[[], Any]) -> CachedResponse:
+        """Shared serialized `await compute()`, computed once per TTL"""
+        return await self._get((name, None, None), ttl, compute)
+
+    @staticmethod
+    def respond(request: Request, body: bytes, etag: Optional[str] = None) -> Response:
+        """JSON response with a strong ETag, 304 when `If-None-Match` matches"""
+        etag = etag or _etag(body)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def invalidate(self, name: str, user: Optional[Hashable] = None):
+        """Drops `name` entries, of one user only when `user` is given"""
+        version_key = name if user is None else (name, user)
+        with self._lock:
+            self._versions[version_key] = self._versions.get(version_key, 0) + 1
+            for key in list(self._keys.get(version_key, ())):
+                self._drop_locked(key)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._keys.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced, "size": len(self._cache)}
+
+    async def _get(self, key, ttl: float, compute: Callable[[], Any]) -> CachedResponse:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and time.monotonic() < entry.expires:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry
+            version = self._version_locked(key)
+            task = self._inflight.get((key, version))
+            if task is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, version, ttl, compute))
+            self._inflight[(key, version)] = task
+            task.add_done_callback(lambda _: self._inflight.pop((key, version), None))
+        # a cancelled caller does not cancel the computation others wait on
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, version, ttl: float, compute: Callable[[], Any]) -> CachedResponse:
+        body = _serialize(await compute())
+        entry = CachedResponse(body, _etag(body), time.monotonic() + ttl)
+        with self._lock:
+            if self._version_locked(key) == version:
+                self._cache[key] = entry
+                self._cache.move_to_end(key)
+                for index_key in _index_keys(key):
+                    self._keys.setdefault(index_key, set()).add(key)
+                while len(self._cache) > self.maxsize:
+                    self._drop_locked(next(iter(self._cache)))
+        return entry
+
+    def _drop_locked(self, key):
+        del self._cache[key]
+        for index_key in _index_keys(key):
+            keys = self._keys[index_key]
+            keys.discard(key)
+            if not keys:
+                del self._keys[index_key]
+
+    def _version_locked(self, key):
+        name, _, user = key
+        return self._versions.get(name, 0), self._versions.get((name, user), 0) if user is not None else 0
+
+
+def _index_keys(key):
+    name, _, user = key
+    return (name,) if user is None else (name, (name, user))
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _serialize(content) -> bytes:
+    if hasattr(content, "model_dump_json"):
+        return content.model_dump_json().encode()
+    return json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
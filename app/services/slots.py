@@ -0,0 +1,181 @@
+import random
+from typing import List, NamedTuple, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # vectorized paths fall back to the scalar ones
+    np = None
+
+
+# ---------------------------
+# SLOT TABLES
+# ---------------------------
+
+SLOT_SYMBOLS = [
+    {"label": "+0.1 Grade", "value": 100},
+    {"label": "Pizza Slice", "value": 80},
+    {"label": "Trophy", "value": 120},
+    {"label": "Star Points", "value": 60},
+    {"label": "Mystery Box", "value": 90},
+    {"label": "Achievement", "value": 110},
+    {"label": "Power Up", "value": 70},
+    {"label": "Extra Life", "value": 85},
+    {"label": "Royal Bonus", "value": 150},
+    {"label": "Jackpot", "value": 200},
+]
+
+
+class Machine(NamedTuple):
+    """
+    Slot machine definition, shared by the API and the simulator
+
+    - symbols: {"label", "value", optional "weight"} per reel position,
+      reels are uniform unless weights are given
+    - 3 equal symbols: jackpot, symbol value x jackpot_multiplier
+    - 2 equal symbols: double, bet x double_multiplier
+    """
+    machine_id: int
+    name: str
+    symbols: List[dict]
+    jackpot_multiplier: float = 3
+    double_multiplier: float = 1.5
+
+    @property
+    def weights(self):
+        if all("weight" not in symbol for symbol in self.symbols):
+            return None
+        return [symbol.get("weight", 1) for symbol in self.symbols]
+
+
+MACHINES = {
+    machine.machine_id: machine
+    for machine in (
+        Machine(1, "Classic", SLOT_SYMBOLS),
+        Machine(2, "Silver", SLOT_SYMBOLS),
+        Machine(3, "Gold", SLOT_SYMBOLS),
+    )
+}
+
+
+class SpinResult(NamedTuple):
+    slots: List[int]
+    win_amount: int
+    is_jackpot: bool
+    is_double: bool
+
+
+# ---------------------------
+# REEL ENCODING
+# ---------------------------
+
+REEL_BITS = 8  # up to 256 symbols per reel
+REEL_MASK = (1 << REEL_BITS) - 1
+
+assert all(len(machine.symbols) <= REEL_MASK + 1 for machine in MACHINES.values())
+
+
+def pack_reels(slots: Sequence[int]) -> int:
+    """[a, b, c] -> a | b << 8 | c << 16 (casino_spins.reels)"""
+    packed = 0
+    for i, slot in enumerate(slots):
+        packed |= int(slot) << (i * REEL_BITS)
+    return packed
+
+
+def unpack_reels(packed: int) -> List[int]:
+    """Inverse of `pack_reels`"""
+    return [(packed >> (i * REEL_BITS)) & REEL_MASK for i in range(3)]
+
+
+def pack_reels_array(reels):
+    """(n, 3) integer array -> (n,) packed reels"""
+    reels = np.asarray(reels, dtype=np.int64)
+    return reels[:, 0] | reels[:, 1] << REEL_BITS | reels[:, 2] << (2 * REEL_BITS)
+
+
+# ---------------------------
+# PAYOUT
+# ---------------------------
+
+def payout(slots: Sequence[int], bet_amount: int, machine: Machine = MACHINES[1]) -> SpinResult:
+    """Evaluates one spin"""
+    slot0, slot1, slot2 = slots
+    if slot0 == slot1 == slot2:
+        win = int(machine.symbols[slot0]["value"] * machine.jackpot_multiplier)
+        return SpinResult(list(slots), win, True, False)
+    if slot0 == slot1 or slot1 == slot2 or slot0 == slot2:
+        return SpinResult(list(slots), int(bet_amount * machine.double_multiplier), False, True)
+    return SpinResult(list(slots), 0, False, False)
+
+
+def payout_array(reels, bet_amount: int, machine: Machine = MACHINES[1]):
+    """
+    Evaluates many spins at once, same rules as `payout`
+
+    reels: (n, 3) integer array. Returns (wins, jackpot mask, double mask)
+    """
+    values = np.array([int(symbol["value"] * machine.jackpot_multiplier) for symbol in machine.symbols])
+
+    a, b, c = reels[:, 0], reels[:, 1], reels[:, 2]
+    jackpot = (a == b) & (b == c)
+    double = ~jackpot & ((a == b) | (b == c) | (a == c))
+    wins = np.where(jackpot, values[a], 0)
+    wins = np.where(double, int(bet_amount * machine.double_multiplier), wins)
+    return wins, jackpot, double
+
+
+def draw_reels(count: int, machine: Machine = MACHINES[1], rng=None):
+    """Draws (count, 3) reel positions"""
+    rng = rng if rng is not None else np.random.default_rng()
+    weights = machine.weights
+    if weights is None:
+        return rng.integers(0, len(machine.symbols), size=(count, 3), dtype=np.int8)
+    p = np.asarray(weights, dtype=float)
+    return rng.choice(len(machine.symbols), size=(count, 3), p=p / p.sum()).astype(np.int8)
+
+
+# ---------------------------
+# PLAY
+# ---------------------------
+
+def play(bet_amount: int, machine: Machine = MACHINES[1]) -> SpinResult:
+    """Server generates random result"""
+    if machine.weights is None:
+        slots = [random.randrange(len(machine.symbols)) for _ in range(3)]
+    else:
+        slots = random.choices(range(len(machine.symbols)), weights=machine.weights, k=3)
+    return payout(slots, bet_amount, machine)
+
+
+def play_batch(count: int, bet_amount: int, balance: int, machine: Machine = MACHINES[1]) -> List[SpinResult]:
+    """
+    Plays up to `count` spins of `bet_amount`, stops when balance runs out
+
+    All reels are drawn at once and evaluated in bulk when numpy is
+    available
+    """
+    if np is None:
+        results = []
+        for _ in range(count):
+            if balance < bet_amount:
+                break
+            result = play(bet_amount, machine)
+            balance += result.win_amount - bet_amount
+            results.append(result)
+        return results
+
+    reels = draw_reels(count, machine)
+    wins, jackpot, double = payout_array(reels, bet_amount, machine)
+
+    # balance before each spin, play while it covers the bet
+    before = balance + np.concatenate(([0], np.cumsum(wins - bet_amount)[:-1]))
+    broke = np.flatnonzero(before < bet_amount)
+    played = int(broke[0]) if broke.size else count
+
+    return [
+        SpinResult(slots, win, is_jackpot, is_double)
+        for slots, win, is_jackpot, is_double in zip(
+            reels[:played].tolist(), wins[:played].tolist(),
+            jackpot[:played].tolist(), double[:played].tolist(),
+        )
+    ]
@@ -0,0 +1,248 @@
+import gzip
+import hashlib
+import mimetypes
+import re
+from email.utils import formatdate
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+# ---------------------------
+# PRECOMPRESSED STATIC FILES
+# ---------------------------
+
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".webmanifest"}
+ENCODINGS = ("br", "gzip")  # server preference
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+HASHED = re.compile(r"-[\w-]{8}\.[a-z0-9]+$")  # vite: [name]-[hash].[ext]
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if level is None else level)
+    return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+
+
+def available_encodings():
+    return [encoding for encoding in ENCODINGS if encoding != "br" or brotli is not None]
+
+
+def compress_directory(directory: Path, min_size: int = 1024) -> int:
+    """
+    Build step: writes .br / .gz next to every compressible file
+    (best quality, skipped when not smaller than the original)
+    """
+    written = 0
+    for path in sorted(Path(directory).rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE or path.stat().st_size < min_size:
+            continue
+        data = path.read_bytes()
+        for encoding in available_encodings():
+            body = compress(data, encoding)
+            if len(body) < len(data):
+                path.with_name(path.name + SUFFIXES[encoding]).write_bytes(body)
+                written += 1
+    return written
+
+
+class Variant:
+    """One encoding of a file: bytes in memory or a path on disk"""
+    __slots__ = ("body", "path", "size", "etag")
+
+    def __init__(self, etag: str, body: Optional[bytes] = None, path: Optional[Path] = None):
+        self.etag = etag
+        self.body = body
+        self.path = path
+        self.size = len(body) if body is not None else path.stat().st_size
+
+
+class StaticFile:
+    __slots__ = ("media_type", "cache_control", "last_modified", "variants")
+
+    def __init__(self, media_type: str, cache_control: str, last_modified: str):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.last_modified = last_modified
+        self.variants: Dict[str, Variant] = {}
+
+
+class PrecompressedStaticFiles:
+    """
+    ASGI app serving a built SPA (replacement for StaticFiles(html=True))
+
+    - .br / .gz variants from the build (`python -m app.cli compress-static`),
+      missing ones compressed once at load, negotiated via Accept-Encoding
+    - content-hashed assets: `Cache-Control: immutable`, a year
+    - everything else (index.html): `no-cache`, revalidated with ETag -> 304
+    - files up to memory_max bytes are held in memory, larger ones are
+      streamed from disk
+    The file list is read once (on startup warm-up or the first request);
+    restart after a new build.
+    """
+    def __init__(
+        self,
+        directory: Path,
+        memory_max: int = 1 << 20,
+        min_compress: int = 1024,
+        brotli_quality: int = 5,
+        gzip_level: int = 6,
+        immutable_max_age: int = 31_536_000,
+    ):
+        self.directory = Path(directory)
+        self.memory_max = memory_max
+        self.min_compress = min_compress
+        self.levels = {"br": brotli_quality, "gzip": gzip_level}
+        self.immutable = f"public, max-age={immutable_max_age}, immutable"
+        self.files: Dict[str, StaticFile] = {}
+        self.loaded = False
+        self._load_lock = Lock()
+
+    # ---------------------------
+    # LOAD
+    # ---------------------------
+
+    def load(self):
+        files = {}
+        for path in sorted(self.directory.rglob("*")):
+            if not path.is_file() or path.suffix in (".br", ".gz") and path.with_suffix("").is_file():
+                continue
+            files[path.relative_to(self.directory).as_posix()] = self._load_file(path)
+        self.files = files
+        self.loaded = True
+
+    def load_once(self):
+        with self._load_lock:
+            if not self.loaded:
+                self.load()
+
+    def _load_file(self, path: Path) -> StaticFile:
+        stat = path.stat()
+        rel = path.relative_to(self.directory).as_posix()
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type in ("application/javascript", "image/svg+xml"):
+            media_type += "; charset=utf-8"
+        cache_control = self.immutable if HASHED.search(rel) else "no-cache"
+        entry = StaticFile(media_type, cache_control, formatdate(stat.st_mtime, usegmt=True))
+
+        compressible = path.suffix in COMPRESSIBLE and stat.st_size >= self.min_compress
+        if stat.st_size > self.memory_max and not compressible:
+            tag = hashlib.md5(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest()
+            entry.variants["identity"] = Variant(f'"{tag}"', path=path)
+            return entry
+
+        data = path.read_bytes()
+        tag = hashlib.md5(data).hexdigest()
+        if len(data) <= self.memory_max:
+            entry.variants["identity"] = Variant(f'"{tag}"', body=data)
+        else:
+            entry.variants["identity"] = Variant(f'"{tag}"', path=path)
+        if not compressible:
+            return entry
+
+        for encoding in available_encodings():
+            etag = f'"{tag}-{encoding}"'
+            built = path.with_name(path.name + SUFFIXES[encoding])
+            if built.is_file() and built.stat().st_mtime >= stat.st_mtime:
+                if built.stat().st_size <= self.memory_max:
+                    entry.variants[encoding] = Variant(etag, body=built.read_bytes())
+                else:
+                    entry.variants[encoding] = Variant(etag, path=built)
+                continue
+            body = compress(data, encoding, self.levels[encoding])
+            if len(body) < len(data):
+                entry.variants[encoding] = Variant(etag, body=body)
+        return entry
+
+    def memory_bytes(self) -> int:
+        return sum(
+            variant.size for entry in self.files.values()
+            for variant in entry.variants.values() if variant.body is not None
+        )
+
+    # ---------------------------
+    # SERVE
+    # ---------------------------
+
+    def lookup(self, path: str) -> Optional[StaticFile]:
+        path = path.lstrip("/")
+        if path == "" or path.endswith("/"):
+            path += "index.html"
+        return self.files.get(path) or self.files.get(f"{path}/index.html")
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if not self.loaded:
+            await run_in_threadpool(self.load_once)
+
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            return await response(scope, receive, send)
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+
+        entry = self.lookup(path)
+        if entry is None:
+            return await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+
+        request_headers = dict(scope["headers"])
+        encoding = negotiate(request_headers.get(b"accept-encoding", b"").decode("latin-1"), entry.variants)
+        variant = entry.variants[encoding]
+        headers = {
+            "cache-control": entry.cache_control,
+            "etag": variant.etag,
+            "last-modified": entry.last_modified,
+        }
+        if len(entry.variants) > 1:
+            headers["vary"] = "Accept-Encoding"
+
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match.decode("latin-1"), variant.etag):
+            return await Response(status_code=304, headers=headers)(scope, receive, send)
+
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        if variant.body is None:
+            response = FileResponse(variant.path, headers=headers, media_type=entry.media_type)
+        else:
+            headers["content-length"] = str(variant.size)
+            body = b"" if scope["method"] == "HEAD" else variant.body
+            response = Response(body, headers=headers, media_type=entry.media_type)
+        await response(scope, receive, send)
+
+
+def negotiate(accept_encoding: str, variants: Dict[str, Variant]) -> str:
+    """Best encoding the client accepts (q > 0) and we have"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        if q > 0:
+            accepted.add(coding.strip().lower())
+
+    for encoding in ENCODINGS:
+        if encoding in variants and encoding in accepted:
+            return encoding
+    return "identity"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
@@ -0,0 +1,62 @@
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from jose import jwt
+
+
+# ---------------------------
+# VERIFIED TOKEN CACHE
+# ---------------------------
+
+class TokenVerifier:
+    """
+    Decodes and verifies JWTs, remembering verified claims
+
+    Claims are cached in a bounded LRU keyed by the token's SHA-256 digest
+    and are dropped at the token's `exp`. Invalid tokens are never cached,
+    every call for them raises `JWTError`.
+    """
+    def __init__(self, secret_key: str, algorithm: str, maxsize: int = 10_000):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._cache = OrderedDict()  # digest -> (exp, claims)
+
+    def verify(self, token: str) -> dict:
+        """Returns claims of a valid token, raises JWTError otherwise"""
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None:
+                exp, claims = entry
+                if exp is None or now < exp:
+                    self._cache.move_to_end(digest)
+                    self.hits += 1
+                    return claims
+                del self._cache[digest]
+            self.misses += 1
+
+        claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+
+        with self._lock:
+            self._cache[digest] = (claims.get("exp"), claims)
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return claims
+
+    def stats(self) -> dict:
+        """Cache counters"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,219 @@
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import parse_qsl
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect, Request
+
+
+# ---------------------------
+# STREAMING MULTIPART UPLOADS
+# ---------------------------
+
+# magic bytes of the image types we accept
+IMAGE_SIGNATURES = {
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+    "image/gif": (b"GIF87a", b"GIF89a"),
+    "image/webp": (b"RIFF",),  # + "WEBP" at offset 8
+}
+
+
+class UploadError(Exception):
+    """Rejected upload, maps to an HTTP error"""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class UploadedFile(NamedTuple):
+    field: str
+    filename: str
+    content_type: str
+    path: Path  # spooled file, caller moves or deletes it
+    size: int
+
+
+class MultipartForm(NamedTuple):
+    fields: Dict[str, str]
+    file: Optional[UploadedFile]
+
+
+class _Part:
+    __slots__ = ("name", "filename", "content_type", "data", "size")
+
+    def __init__(self):
+        self.name = None
+        self.filename = None
+        self.content_type = ""
+        self.data = []
+        self.size = 0
+
+
+async def read_form(
+    request: Request,
+    spool_dir: Path,
+    file_field: str,
+    max_file_bytes: int,
+    max_field_bytes: int,
+    max_fields: int = 8,
+) -> MultipartForm:
+    """
+    Reads a form body as it arrives
+
+    - application/x-www-form-urlencoded: fields only, bounded by
+      max_fields * max_field_bytes
+    - multipart/form-data: text fields are kept in memory, up to max_field_bytes each
+    - the one file field is written to spool_dir chunk by chunk (in the
+      threadpool), so memory use is one network chunk
+    - 413 before reading when Content-Length is already too large,
+      otherwise as soon as a limit is crossed; the rest of the body is
+      never read and the partial file is removed
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    if content_type == b"application/x-www-form-urlencoded":
+        return MultipartForm(await _read_urlencoded(request, max_field_bytes, max_fields), None)
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError(415, "Expected multipart/form-data or a urlencoded form")
+
+    max_body = max_file_bytes + max_fields * (max_field_bytes + 1024)
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) > max_body:
+        raise UploadError(413, f"Upload larger than {max_file_bytes} bytes")
+
+    fields: Dict[str, str] = {}
+    header = {"field": b"", "value": b"", "headers": {}}
+    state = {"part": None, "file": None}
+
+    def on_part_begin():
+        state["part"] = _Part()
+        header["headers"] = {}
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        header["headers"][header["field"].lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        part = state["part"]
+        _, disposition = parse_options_header(header["headers"].get(b"content-disposition"))
+        part.name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in disposition:
+            if part.name != file_field or state["file"] is not None:
+                raise UploadError(400, f"Only one file, in the {file_field!r} field")
+            part.filename = os.path.basename(disposition[b"filename"].decode("utf-8", "replace"))
+            part.content_type = header["headers"].get(b"content-type", b"").decode("latin-1").lower()
+            state["file"] = part
+        elif len(fields) >= max_fields:
+            raise UploadError(413, "Too many fields")
+
+    def on_part_data(data, start, end):
+        part = state["part"]
+        part.size += end - start
+        if part.filename is not None:
+            if part.size > max_file_bytes:
+                raise UploadError(413, f"Upload larger than {max_file_bytes} bytes")
+        elif part.size > max_field_bytes:
+            raise UploadError(413, f"Field {part.name!r} longer than {max_field_bytes} bytes")
+        part.data.append(data[start:end])
+
+    def on_part_end():
+        part = state["part"]
+        if part.filename is None:
+            fields[part.name] = b"".join(part.data).decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    path = Path(spool_dir) / f"{uuid.uuid4().hex}.part"
+    out = None
+
+    async def flush():
+        nonlocal out
+        part = state["file"]
+        if part is None or not part.data:
+            return
+        if out is None:
+            out = await run_in_threadpool(open, path, "wb")
+        data = b"".join(part.data)
+        part.data.clear()
+        await run_in_threadpool(out.write, data)
+
+    received = 0
+    try:
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_body:
+                    raise UploadError(413, f"Upload larger than {max_file_bytes} bytes")
+                parser.write(chunk)
+                await flush()
+            parser.finalize()
+            await flush()
+        except ClientDisconnect:
+            raise UploadError(400, "Upload interrupted")
+        except MultipartParseError:
+            raise UploadError(400, "Malformed multipart body")
+        finally:
+            if out is not None:
+                await run_in_threadpool(out.close)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+
+    part = state["file"]
+    if part is None or part.size == 0:
+        path.unlink(missing_ok=True)
+        return MultipartForm(fields, None)
+    return MultipartForm(fields, UploadedFile(part.name, part.filename, part.content_type, path, part.size))
+
+
+async def _read_urlencoded(request: Request, max_field_bytes: int, max_fields: int) -> Dict[str, str]:
+    max_bytes = max_fields * (max_field_bytes * 3 + 64)  # percent-encoded
+    body = bytearray()
+    try:
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > max_bytes:
+                raise UploadError(413, f"Form larger than {max_bytes} bytes")
+    except ClientDisconnect:
+        raise UploadError(400, "Upload interrupted")
+    try:
+        pairs = parse_qsl(body.decode("latin-1"), keep_blank_values=True,
+                          encoding="utf-8", errors="replace", max_num_fields=max_fields)
+    except ValueError:
+        raise UploadError(413, "Too many fields")
+    for name, value in pairs:
+        if len(value.encode()) > max_field_bytes:
+            raise UploadError(413, f"Field {name!r} longer than {max_field_bytes} bytes")
+    return dict(pairs)
+
+
+def sniff_image(path: Path) -> Optional[str]:
+    """Image type from the file's first bytes, None if not an accepted image"""
+    with open(path, "rb") as f:
+        head = f.read(12)
+    for content_type, signatures in IMAGE_SIGNATURES.items():
+        if head.startswith(signatures):
+            if content_type == "image/webp" and head[8:12] != b"WEBP":
+                continue
+            return content_type
+    return None
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from datetime import date
+from threading import Lock
+from typing import Callable, NamedTuple, Optional
+
+
+# ---------------------------
+# USER ROW CACHE
+# ---------------------------
+
+class CachedUser(NamedTuple):
+    id: int
+    username: str
+    points: int
+    total_study_minutes: int
+    current_streak: int
+    last_study_date: Optional[date]
+
+
+class UserCache:
+    """
+    Hot user fields by user id (per-process TTL + LRU)
+
+    Routes that change points / minutes / streak call `invalidate` after
+    their commit. Invalidation leaves a tombstone with a new version, so a
+    reader that loaded the row before the write cannot put it back.
+    Thread-safe, lookups run in the DB threadpool.
+    """
+    def __init__(self, maxsize: int = 10_000, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._cache = OrderedDict()  # user_id -> (expires, version, CachedUser | None)
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and entry[2] is not None and time.monotonic() < entry[0]:
+                self._cache.move_to_end(user_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def get_or_load(self, user_id: int, load: Callable[[int], Optional[CachedUser]]) -> Optional[CachedUser]:
+        """Cached row, or `load(user_id)` (None: no such user, not cached)"""
+        user = self.get(user_id)
+        if user is not None:
+            return user
+
+        version = self._version(user_id)
+        user = load(user_id)
+        if user is not None:
+            self._put(user, version)
+        return user
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._store(user_id, 0.0, self._version_locked(user_id) + 1, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+    def _version(self, user_id: int) -> int:
+        with self._lock:
+            return self._version_locked(user_id)
+
+    def _version_locked(self, user_id: int) -> int:
+        entry = self._cache.get(user_id)
+        return entry[1] if entry is not None else 0
+
+    def _put(self, user: CachedUser, version: int):
+        with self._lock:
+            if self._version_locked(user.id) == version:  # no write since the read started
+                self._store(user.id, time.monotonic() + self.ttl, version, user)
+
+    def _store(self, user_id: int, expires: float, version: int, user: Optional[CachedUser]):
+        self._cache[user_id] = (expires, version, user)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
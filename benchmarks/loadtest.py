@@ -0,0 +1,317 @@
+"""
+API load test
+
+Drives a weighted mix of login, dashboard, leaderboard, community, casino and study
+traffic at the app on a seeded database and reports throughput and
+p50 / p95 / p99 latency per endpoint as JSON, so runs can be compared
+across commits.
+
+- inprocess: the FastAPI app through httpx.ASGITransport (no sockets;
+  client and server share one event loop, so absolute numbers are
+  pessimistic, but regressions show up the same)
+- uvicorn:   spawns `uvicorn app.main:app` on the same database
+- --url:     an already running server whose database was seeded with
+             `python -m benchmarks.seed`
+
+Usage:
+    python -m benchmarks.loadtest [--mode inprocess|uvicorn] [--users 10000] [--sessions 500000] [--spins 1000000]
+                                  [--db PATH] [--duration 20] [--concurrency 32] [--out run.json]
+                                  [--mix dashboard_stats=30,casino_spin=20,...]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from benchmarks.seed import LOADTEST_PASSWORD
+
+MIX = {
+    "login": 2,
+    "dashboard_stats": 30,
+    "dashboard_leaderboard": 25,
+    "casino_stats": 15,
+    "community_stats": 5,
+    "casino_spin": 20,
+    "study_complete": 8,
+}
+
+
+# ---------------------------
+# TRAFFIC
+# ---------------------------
+
+def _login(username):
+    return "POST", "/api/login", {"json": {"username": username, "password": LOADTEST_PASSWORD}}
+
+
+OPERATIONS = {
+    "login": _login,
+    "dashboard_stats": lambda username: ("GET", "/api/dashboard/stats", {}),
+    "dashboard_leaderboard": lambda username: ("GET", "/api/dashboard/leaderboard", {}),
+    "casino_stats": lambda username: ("GET", "/api/casino/stats", {}),
+    "community_stats": lambda username: ("GET", "/api/community/stats", {}),
+    "casino_spin": lambda username: ("POST", "/api/casino/spin", {"json": {"bet_amount": 10, "machine_id": 1}}),
+    "study_complete": lambda username: ("POST", "/api/study/complete", {"json": {"duration_minutes": 25}}),
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)  # name -> seconds
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.recording = False
+
+    def add(self, name, seconds, status):
+        if not self.recording:
+            return
+        self.samples[name].append(seconds)
+        self.statuses[name][status] += 1
+        if status == "error" or status >= 500:
+            self.errors[name] += 1
+
+
+async def log_in(client, username):
+    method, path, kwargs = _login(username)
+    response = await client.request(method, path, **kwargs)
+    if response.status_code != 200:
+        raise SystemExit(f"login as {username} failed ({response.status_code}), is the database seeded?")
+
+
+async def virtual_user(client, username, deadline, rng, mix, recorder):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, kwargs = OPERATIONS[name](username)
+        start = time.perf_counter()
+        try:
+            status = (await client.request(method, path, **kwargs)).status_code
+        except Exception:
+            status = "error"
+        recorder.add(name, time.perf_counter() - start, status)
+
+
+async def drive(make_client, users, concurrency, duration, warmup, mix, seed):
+    rng = random.Random(seed)
+    recorder = Recorder()
+    clients = [make_client() for _ in range(concurrency)]
+    usernames = [f"user{rng.randint(1, users)}" for _ in clients]
+    # sessions first: Argon2 logins of every virtual user would otherwise
+    # fall into the measured window
+    await asyncio.gather(*(log_in(client, username) for client, username in zip(clients, usernames)))
+
+    deadline = time.perf_counter() + warmup + duration
+    tasks = [
+        asyncio.create_task(virtual_user(client, username, deadline, random.Random(rng.random()), mix, recorder))
+        for client, username in zip(clients, usernames)
+    ]
+    await asyncio.sleep(warmup)
+    recorder.recording = True
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    for client in clients:
+        await client.aclose()
+    return recorder, elapsed
+
+
+# ---------------------------
+# TARGETS
+# ---------------------------
+
+async def run_inprocess(args, mix):
+    import httpx
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        return await drive(
+            lambda: httpx.AsyncClient(transport=transport, base_url="http://loadtest"),
+            args.users, args.concurrency, args.duration, args.warmup, mix, args.seed,
+        )
+
+
+async def run_http(args, mix, url):
+    import httpx
+
+    return await drive(
+        lambda: httpx.AsyncClient(base_url=url, timeout=30),
+        args.users, args.concurrency, args.duration, args.warmup, mix, args.seed,
+    )
+
+
+def start_uvicorn(workers, env):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    import httpx
+
+    for _ in range(300):
+        if process.poll() is not None:
+            raise SystemExit(f"uvicorn exited with {process.returncode}")
+        try:
+            if httpx.get(f"{url}/login").status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("uvicorn did not start in 30s")
+
+
+# ---------------------------
+# REPORT
+# ---------------------------
+
+def percentile(sorted_samples, q):
+    """Nearest-rank percentile of sorted samples"""
+    if not sorted_samples:
+        return 0.0
+    rank = math.ceil(q / 100 * len(sorted_samples))
+    return sorted_samples[min(max(rank, 1), len(sorted_samples)) - 1]
+
+
+def summarize(samples, statuses, errors, elapsed):
+    samples = sorted(samples)
+    ms = lambda seconds: round(seconds * 1000, 3)  # noqa: E731
+    return {
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "mean_ms": ms(sum(samples) / len(samples)) if samples else 0.0,
+        "p50_ms": ms(percentile(samples, 50)),
+        "p95_ms": ms(percentile(samples, 95)),
+        "p99_ms": ms(percentile(samples, 99)),
+        "max_ms": ms(samples[-1]) if samples else 0.0,
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def report(args, mix, recorder, elapsed, scale):
+    commit, dirty = git_commit()
+    all_statuses = Counter()
+    for statuses in recorder.statuses.values():
+        all_statuses.update(statuses)
+    return {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "mode": "url" if args.url else args.mode,
+            "db_mode": os.environ.get("LOCKIN_DB_MODE", "sync"),
+            "workers": args.workers if args.mode == "uvicorn" and not args.url else None,
+            "python": platform.python_version(),
+            "scale": scale,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        "total": summarize(
+            [s for samples in recorder.samples.values() for s in samples],
+            all_statuses, sum(recorder.errors.values()), elapsed,
+        ),
+        "endpoints": {
+            name: summarize(recorder.samples[name], recorder.statuses[name], recorder.errors[name], elapsed)
+            for name in mix if recorder.samples[name]
+        },
+    }
+
+
+def parse_mix(value):
+    mix = dict(MIX)
+    if value:
+        for part in value.split(","):
+            name, _, weight = part.partition("=")
+            if name not in OPERATIONS:
+                raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}, choose from {', '.join(OPERATIONS)}")
+            mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--url", help="target a running server instead (seeded database)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--db", help="seeded sqlite file, created and seeded if missing (default: temporary)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--sessions", type=int, default=500_000)
+    parser.add_argument("--spins", type=int, default=1_000_000)
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(None), help="endpoint=weight,...")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    scale = {"users": args.users, "sessions": args.sessions, "spins": args.spins}
+    if args.url:
+        recorder, elapsed = asyncio.run(run_http(args, args.mix, args.url.rstrip("/")))
+        result = report(args, args.mix, recorder, elapsed, scale)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.abspath(args.db or os.path.join(tmp, "loadtest.db"))
+            os.environ["LOCKIN_DATABASE_URL"] = f"sqlite:///{db_path}"
+            os.environ["LOCKIN_LOG_FILE"] = os.path.join(tmp, "loadtest.log")
+            if not os.path.exists(db_path):
+                from app.db.database import engine
+                from benchmarks.seed import seed
+
+                seed(engine, args.users, args.sessions, args.spins, seed=args.seed,
+                     log=lambda line: print(line, file=sys.stderr))
+                engine.dispose()
+
+            if args.mode == "inprocess":
+                recorder, elapsed = asyncio.run(run_inprocess(args, args.mix))
+            else:
+                process, url = start_uvicorn(args.workers, dict(os.environ))
+                try:
+                    recorder, elapsed = asyncio.run(run_http(args, args.mix, url))
+                finally:
+                    process.terminate()
+                    process.wait(timeout=30)
+            result = report(args, args.mix, recorder, elapsed, scale)
+
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
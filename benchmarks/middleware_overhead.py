@@ -0,0 +1,108 @@
+"""
+Per-request overhead of the SPA auth guard
+
+Compares the old BaseHTTPMiddleware guard (kept here verbatim, prints
+included) with the pure-ASGI AuthRequiredMiddleware, both wrapping a
+trivial ASGI app. Requests are driven directly through the ASGI
+interface, so only middleware cost is measured.
+
+Usage:
+    python -m benchmarks.middleware_overhead [-n 20000]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from jose import JWTError, jwt
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import RedirectResponse
+
+from app.middleware.auth import AuthRequiredMiddleware
+from app.services.tokens import TokenVerifier
+
+SECRET_KEY = "bench"
+ALGORITHM = "HS256"
+
+
+class LegacyAuthRequiredMiddleware(BaseHTTPMiddleware):
+    """Guard as it was before the ASGI rewrite"""
+    async def dispatch(self, request: Request, call_next):
+        print(request.url)
+        if request.url.path.startswith("/app/index.html"):
+            token = request.cookies.get("access_token")
+            print(token)
+            if not token:
+                return RedirectResponse("/login")
+            try:
+                jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+                print("decoded")
+            except JWTError:
+                return RedirectResponse("/login")
+        return await call_next(request)
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def make_scope(path, token):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("testserver", 80),
+        "client": ("127.0.0.1", 1234),
+        "headers": [(b"host", b"testserver"), (b"cookie", f"access_token={token}".encode())],
+    }
+
+
+async def drive(app, scope, n):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / n
+
+
+async def run(n):
+    token = jwt.encode({"sub": "bench", "exp": int(time.time()) + 3600}, SECRET_KEY, algorithm=ALGORITHM)
+    apps = {
+        "none": endpoint,
+        "legacy": LegacyAuthRequiredMiddleware(endpoint),
+        "asgi": AuthRequiredMiddleware(endpoint, verifier=TokenVerifier(SECRET_KEY, ALGORITHM)),
+    }
+    paths = {"static asset": "/app/assets/index.js", "protected": "/app/index.html"}
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for label, path in paths.items():
+            for name, app in apps.items():
+                scope = make_scope(path, token)
+                await drive(app, scope, n // 10)  # warm up
+                results[label, name] = await drive(app, scope, n)
+
+    for label in paths:
+        base = results[label, "none"]
+        print(f"{label}:")
+        for name in apps:
+            per_request = results[label, name]
+            print(f"  {name:<7} {per_request * 1e6:8.2f} us/request  (+{(per_request - base) * 1e6:.2f} us)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=20_000, help="requests per case")
+    args = parser.parse_args()
+    asyncio.run(run(args.n))
+
+
+if __name__ == "__main__":
+    main()
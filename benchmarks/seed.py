@@ -0,0 +1,43 @@
+"""
+Seeds a scratch database for benchmarks
+
+Thin wrapper over the synthetic data generator (`app.db.seed`, also
+`python -m app.cli seed`) that targets a given sqlite file. Every seeded
+user logs in as user<N> / LOADTEST_PASSWORD.
+
+Usage:
+    python -m benchmarks.seed --db /tmp/lockin-bench.db [--users 100000] [--sessions 10000000] [--spins 20000000]
+"""
+import argparse
+import json
+import os
+
+LOADTEST_PASSWORD = "loadtest-password"  # no app imports here: they open the database
+
+
+def seed(engine, users: int, sessions: int, spins: int, seed: int = 0, log=print) -> dict:
+    """Fills an empty database, returns row counts and timings"""
+    from app.db.seed import generate
+
+    return generate(engine, users, sessions, spins, seed=seed, password=LOADTEST_PASSWORD, log=log)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", required=True, help="sqlite file to create")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--sessions", type=int, default=10_000_000)
+    parser.add_argument("--spins", type=int, default=20_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+    os.environ["LOCKIN_DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    from app.db.database import engine
+
+    print(json.dumps(seed(engine, args.users, args.sessions, args.spins, seed=args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Concurrency stress test for casino balance updates
+
+Fires many parallel /api/casino/spin and /api/casino/spin/batch requests
+at one account on a scratch database and checks that the final balance
+matches the spin history exactly and never went below zero, i.e. no
+bet was paid twice from the same points.
+
+Usage:
+    python -m benchmarks.spin_concurrency [--requests 400] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+START_POINTS = 5000
+
+
+async def run(requests, concurrency, bet):
+    import httpx
+    from sqlalchemy import text
+
+    from app.db.database import SessionLocal
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/api/register", json={"username": "stress", "email": "stress@example.com", "password": "password1"})
+        await client.post("/api/login", json={"username": "stress", "password": "password1"})
+        with SessionLocal() as db:
+            db.execute(text("UPDATE users SET points = :points WHERE username = 'stress'"), {"points": START_POINTS})
+            db.commit()
+
+        limit = asyncio.Semaphore(concurrency)
+        statuses = {}
+
+        async def fire(i):
+            async with limit:
+                if i % 5 == 0:
+                    response = await client.post("/api/casino/spin/batch", json={"bet_amount": bet, "machine_id": 1, "count": 10})
+                else:
+                    response = await client.post("/api/casino/spin", json={"bet_amount": bet, "machine_id": 1})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        await asyncio.gather(*(fire(i) for i in range(requests)))
+
+    db = SessionLocal()
+    try:
+        points = db.execute(text("SELECT points FROM users WHERE username = 'stress'")).scalar()
+        spins, bets, wins = db.execute(text(
+            "SELECT COUNT(*), COALESCE(SUM(bet_amount), 0), COALESCE(SUM(win_amount), 0) FROM casino_spins"
+        )).one()
+        # replay history in order: balance before every spin must cover the bet
+        balance, overdrawn = START_POINTS, 0
+        for bet_amount, win_amount in db.execute(text("SELECT bet_amount, win_amount FROM casino_spins ORDER BY id")):
+            if balance < bet_amount:
+                overdrawn += 1
+            balance += win_amount - bet_amount
+    finally:
+        db.close()
+
+    expected = START_POINTS - bets + wins
+    print(f"responses: {dict(sorted(statuses.items()))}")
+    print(f"spins: {spins}, bets: {bets}, wins: {wins}")
+    print(f"balance: {points}, expected from history: {expected}, overdrawn spins: {overdrawn}")
+    ok = points == expected and points >= 0 and overdrawn == 0
+    print("OK" if ok else "DOUBLE SPEND DETECTED")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--bet", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["LOCKIN_DATABASE_URL"] = f"sqlite:///{tmp}/stress.db"
+        os.environ.setdefault("LOCKIN_HASH_WORKERS", "0")
+        ok = asyncio.run(run(args.requests, args.concurrency, args.bet))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Startup benchmark
+
+Seeds a scratch database with many users, then starts the app in fresh
+interpreters (like a uvicorn worker or a --reload) and measures:
+
+- import:         `import app.main`
+- startup:        lifespan startup (schema check)
+- first_request:  first GET /login after startup
+- first_ranked:   first GET /api/dashboard/leaderboard (loads the index
+                  unless the background warm-up already did)
+- process:        whole child process, interpreter start to exit
+
+Usage:
+    python -m benchmarks.startup [--users 200000] [--runs 5] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+METRICS = ("import", "startup", "first_request", "first_ranked", "process")
+
+
+def seed(users):
+    from sqlalchemy import text
+
+    from app.db import migrations
+    from app.db.database import engine
+
+    migrations.migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO users (username, email, password_hash, points, total_study_minutes, current_streak) "
+                "VALUES (:username, :email, 'x', 1000, :minutes, 0)"
+            ),
+            [
+                {"username": f"user{i}", "email": f"user{i}@example.com", "minutes": (i * 7919) % 10_000}
+                for i in range(1, users + 1)
+            ],
+        )
+
+
+async def child():
+    start = time.perf_counter()
+    import httpx
+
+    import app.main as main
+    imported = time.perf_counter()
+
+    async with main.app.router.lifespan_context(main.app):
+        started = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/login")
+            assert response.status_code == 200, response.status_code
+            first_request = time.perf_counter()
+
+            client.cookies.set("access_token", main.create_access_token("user1", 1))
+            response = await client.get("/api/dashboard/leaderboard")
+            assert response.status_code == 200, response.status_code
+            first_ranked = time.perf_counter()
+
+    print(json.dumps({
+        "import": imported - start,
+        "startup": started - imported,
+        "first_request": first_request - started,
+        "first_ranked": first_ranked - started,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child())
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            LOCKIN_DATABASE_URL=f"sqlite:///{tmp}/startup.db",
+            LOCKIN_HASH_WORKERS="0",
+        )
+        os.environ.update(env)
+        seed(args.users)
+
+        runs = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.startup", "--child"],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            result["process"] = time.perf_counter() - start
+            runs.append(result)
+
+    report = {
+        "users": args.users,
+        "runs": args.runs,
+        **{
+            metric: {
+                "median_ms": round(statistics.median(run[metric] for run in runs) * 1000, 1),
+                "min_ms": round(min(run[metric] for run in runs) * 1000, 1),
+            }
+            for metric in METRICS
+        },
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{args.users:,} users, {args.runs} runs")
+    print(f"  {'':14}{'median ms':>12}{'min ms':>12}")
+    for metric in METRICS:
+        print(f"  {metric:14}{report[metric]['median_ms']:12.1f}{report[metric]['min_ms']:12.1f}")
+
+
+if __name__ == "__main__":
+    main()